@@ -0,0 +1,64 @@
+import argparse
+import time
+
+import pandas as pd
+
+from src.modules.data_module import REPORT_COLUMNS, get_total_battles, get_total_tanks, get_top_tanks_in_tears
+from src.modules.aggregate_module import CSV_DTYPES
+from src.modules.sketch_module import *
+
+# Ошибка и ускорение приближенного режима относительно точных функций data_module.
+# Запуск из папки Lab_1: python -m benchmarks.approximate --path src/data/wot.csv
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def exact_report(df: pd.DataFrame, top_size: int) -> tuple[int, int, pd.DataFrame]:
+    return get_total_battles(df), get_total_tanks(df), get_top_tanks_in_tears(df, top_size)
+
+
+def approx_report(df: pd.DataFrame, top_size: int) -> tuple[int, int, pd.DataFrame]:
+    sketches = build_sketches(df)
+    return approx_total_battles(sketches), approx_total_tanks(sketches), approx_top_tanks_in_tiers(sketches, top_size)
+
+
+def top_recall(exact: pd.DataFrame, approx: pd.DataFrame) -> float:
+    # доля точного top-N, найденная приближенно; при равных счетчиках состав может отличаться
+    exact_keys = set(zip(exact['tier'].astype('int64'), exact['name']))
+    approx_keys = set(zip(approx['tier'].astype('int64'), approx['name']))
+    return len(exact_keys & approx_keys) / max(1, len(exact_keys))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Approximate mode error and speedup")
+    parser.add_argument("--path", default="src/data/wot.csv")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.path, usecols=REPORT_COLUMNS, dtype=CSV_DTYPES)
+    (battles, tanks, top_tanks), exact_time = timed(exact_report, df, args.top)
+    (approx_battles, approx_tanks, approx_top), approx_time = timed(approx_report, df, args.top)
+
+    # сквозное время с чтением файла: точно - весь файл в память, приближенно - по кускам
+    _, exact_file_time = timed(lambda: exact_report(pd.read_csv(args.path, usecols=REPORT_COLUMNS,
+                                                                dtype=CSV_DTYPES), args.top))
+    _, approx_file_time = timed(load_sketches, [args.path])
+
+    merged = top_tanks.merge(approx_top, on=['tier', 'name'], suffixes=('_exact', '_approx'))
+    count_error = (merged['counts_approx'] - merged['counts_exact']).abs().max() if len(merged) else 0.0
+
+    print(f"\n{'metric':>16} {'exact':>10} {'approx':>10} {'error':>8}")
+    print(f"{'battles':>16} {battles:>10} {approx_battles:>10} {abs(approx_battles - battles) / max(1, battles):>7.2%}")
+    print(f"{'tanks':>16} {tanks:>10} {approx_tanks:>10} {abs(approx_tanks - tanks) / max(1, tanks):>7.2%}")
+    print(f"top-{args.top} recall: {top_recall(top_tanks, approx_top):.2%}, max counts error: {count_error:.2f}")
+    print(f"in memory: exact {exact_time:.2f}s, approx {approx_time:.2f}s, speedup {exact_time / approx_time:.2f}x")
+    print(f"from file: exact {exact_file_time:.2f}s, approx {approx_file_time:.2f}s, "
+          f"speedup {exact_file_time / approx_file_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
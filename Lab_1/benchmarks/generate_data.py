@@ -0,0 +1,93 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Синтетический wot.csv той же формы, что и настоящая выгрузка:
+# бой - 30 игроков на одной карте в две команды (spawn 1/2), бои идут по времени,
+# популярность танков неравномерная (закон Ципфа), урон и засвет зависят от класса.
+# Файл пишется кусками, поэтому размер ограничен только диском.
+# Запуск из папки Lab_1: python -m benchmarks.generate_data --rows 1000000 --out src/data/wot.csv
+
+CSV_COLUMNS = ['battle_time', 'name', 'tier', 'class', 'display_name', 'damage', 'spotting_assist', 'spawn']
+CLASSES = np.array(['LT', 'MT', 'HT', 'TD', 'SPG'])
+CLASS_WEIGHTS = [0.15, 0.35, 0.25, 0.18, 0.07]
+# средний урон и засвет по классам в том же порядке
+CLASS_DAMAGE = np.array([900, 1600, 1900, 1800, 1200])
+CLASS_SPOTTING = np.array([2200, 500, 250, 300, 100])
+PLAYERS_IN_BATTLE = 30
+BATTLE_SECONDS = 420
+
+
+def make_tanks(tanks: int, rng: np.random.Generator) -> pd.DataFrame:
+    popularity = 1 / np.arange(1, tanks + 1) ** 1.1
+    return pd.DataFrame({'name': [f"tank_{i}" for i in range(tanks)],
+                         'tier': rng.integers(1, 12, tanks),
+                         'class_id': rng.choice(len(CLASSES), tanks, p=CLASS_WEIGHTS),
+                         'weight': rng.permutation(popularity / popularity.sum())})
+
+
+def generate_chunk(first_battle: int, battles: int, tanks: pd.DataFrame, maps: np.ndarray,
+                   start: pd.Timestamp, rng: np.random.Generator, nan_share: float) -> pd.DataFrame:
+    rows = battles * PLAYERS_IN_BATTLE
+    battle_ids = np.repeat(np.arange(first_battle, first_battle + battles), PLAYERS_IN_BATTLE)
+    tank_ids = rng.choice(len(tanks), rows, p=tanks['weight'].to_numpy())
+    class_ids = tanks['class_id'].to_numpy()[tank_ids]
+
+    df = pd.DataFrame({
+        'battle_time': (start + pd.to_timedelta(battle_ids * BATTLE_SECONDS, unit='s')).astype(str),
+        'name': tanks['name'].to_numpy()[tank_ids],
+        'tier': tanks['tier'].to_numpy()[tank_ids],
+        'class': CLASSES[class_ids],
+        'display_name': maps[rng.integers(0, len(maps), battles)].repeat(PLAYERS_IN_BATTLE),
+        'damage': rng.gamma(2.0, CLASS_DAMAGE[class_ids] / 2.0).round(),
+        'spotting_assist': rng.gamma(1.5, CLASS_SPOTTING[class_ids] / 1.5).round(),
+        'spawn': np.tile(np.repeat([1, 2], PLAYERS_IN_BATTLE // 2), battles),
+    }).astype({'damage': 'Int64', 'spotting_assist': 'Int64', 'tier': 'Int64'})
+
+    if nan_share:
+        # пропуски, как в реальной выгрузке: неполные записи боев
+        for col in ['battle_time', 'tier', 'damage', 'spotting_assist']:
+            df.loc[rng.random(rows) < nan_share, col] = None
+    return df
+
+
+def generate_wot_csv(out: str, rows: int, tanks: int = 600, maps: int = 40, nan_share: float = 0.0,
+                     seed: int = 0, chunk_rows: int = 1_000_000) -> str:
+    rng = np.random.default_rng(seed)
+    tank_table = make_tanks(tanks, rng)
+    map_names = np.array([f"map_{i}" for i in range(maps)])
+    start = pd.Timestamp('2024-01-01')
+
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    total_battles = -(-rows // PLAYERS_IN_BATTLE)
+    chunk_battles = max(1, chunk_rows // PLAYERS_IN_BATTLE)
+    written = 0
+    print(f"Generate {rows} rows to {out}...")
+    with open(out, 'w', newline='') as f:
+        for first_battle in range(0, total_battles, chunk_battles):
+            battles = min(chunk_battles, total_battles - first_battle)
+            chunk = generate_chunk(first_battle, battles, tank_table, map_names, start, rng, nan_share)
+            chunk = chunk.head(rows - written)
+            chunk.to_csv(f, header=written == 0, index=False, columns=CSV_COLUMNS)
+            written += len(chunk)
+
+    print(f"Generated {written} rows")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic wot.csv")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--out", default="src/data/wot.csv")
+    parser.add_argument("--tanks", type=int, default=600)
+    parser.add_argument("--maps", type=int, default=40)
+    parser.add_argument("--nan-share", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_wot_csv(args.out, args.rows, args.tanks, args.maps, args.nan_share, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import time
+
+import pandas as pd
+
+from src.modules.aggregate_module import *
+
+# Масштабирование параллельной агрегации по числу процессов.
+# Запуск из папки Lab_1: python -m benchmarks.parallel_scaling --path src/data/wot.csv
+
+
+def report_frames(aggregates: dict[str, pd.DataFrame]) -> list[pd.DataFrame]:
+    return [top_tanks_in_tiers(aggregates),
+            light_tanks_spotting_assist(aggregates),
+            max_average_damage_in_types(aggregates, ["MT", "HT", "TD"]),
+            *[tanks_max_average_damage(aggregates, t_type, 10) for t_type in ["MT", "HT", "TD"]]]
+
+
+def assert_same_report(expected: dict[str, pd.DataFrame], actual: dict[str, pd.DataFrame]):
+    assert total_battles(expected) == total_battles(actual)
+    assert total_tanks(expected) == total_tanks(actual)
+    for left, right in zip(report_frames(expected), report_frames(actual)):
+        pd.testing.assert_frame_equal(left.reset_index(drop=True), right.reset_index(drop=True),
+                                      check_dtype=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel aggregation scaling benchmark")
+    parser.add_argument("--path", default="src/data/wot.csv")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--partition-mb", type=int, default=64)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    serial = load_aggregates(args.path)
+    serial_time = time.perf_counter() - start
+
+    rows = [("serial", serial_time, 1.0)]
+    for workers in [int(w) for w in args.workers.split(",")]:
+        start = time.perf_counter()
+        parallel = load_aggregates_parallel(args.path, workers=workers,
+                                            partition_bytes=args.partition_mb * 1024 * 1024)
+        elapsed = time.perf_counter() - start
+        assert_same_report(serial, parallel)
+        rows.append((f"{workers} workers", elapsed, serial_time / elapsed))
+
+    print(f"\n{'mode':>12} {'time, s':>10} {'speedup':>8}")
+    for mode, elapsed, speedup in rows:
+        print(f"{mode:>12} {elapsed:>10.2f} {speedup:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
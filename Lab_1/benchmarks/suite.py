@@ -0,0 +1,195 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.generate_data import generate_wot_csv
+from src.modules.data_module import *
+from src.modules.aggregate_module import compute_aggregates, load_aggregates
+from src.modules.cache_module import get_cache_path
+
+# Набор бенчмарков в духе asv: время (min/median по повторам) и пик памяти
+# через tracemalloc для load_data и каждой функции отчета data_module.
+# Данные генерируются один раз на размер и переиспользуются между запусками.
+# Результат можно сохранить как baseline и сравнивать с ним следующие запуски:
+#   python -m benchmarks.suite --rows 10000,100000 --save benchmarks/baselines/baseline.json
+#   python -m benchmarks.suite --rows 10000,100000 --compare benchmarks/baselines/baseline.json
+# tracemalloc видит аллокации numpy/pandas, но не буферы pyarrow.
+
+# разница меньше этих порогов считается шумом
+MIN_TIME_DELTA_S = 0.002
+MIN_MEMORY_DELTA_MB = 1.0
+
+
+def bench_load_csv(path: str, df: pd.DataFrame):
+    return load_data(None, path)
+
+
+def bench_load_report_columns(path: str, df: pd.DataFrame):
+    return load_data(None, path, columns=REPORT_COLUMNS)
+
+
+def bench_load_parquet_cache(path: str, df: pd.DataFrame):
+    return load_data(None, path, use_cache=True, columns=REPORT_COLUMNS)
+
+
+def bench_top_tanks_in_tiers(path: str, df: pd.DataFrame):
+    return get_top_tanks_in_tears(df)
+
+
+def bench_light_tanks_spotting(path: str, df: pd.DataFrame):
+    return get_light_tanks_spotting_asist(df)
+
+
+def bench_tanks_max_average_damage(path: str, df: pd.DataFrame):
+    return get_tanks_max_average_damage(df, "MT")
+
+
+def bench_max_average_damage_in_types(path: str, df: pd.DataFrame):
+    return get_max_average_damage_in_types(df, ["MT", "HT", "TD"])
+
+
+def bench_total_battles(path: str, df: pd.DataFrame):
+    return get_total_battles(df)
+
+
+def bench_total_tanks(path: str, df: pd.DataFrame):
+    return get_total_tanks(df)
+
+
+def bench_compute_aggregates(path: str, df: pd.DataFrame):
+    return compute_aggregates(df)
+
+
+def bench_load_aggregates(path: str, df: pd.DataFrame):
+    return load_aggregates(path)
+
+
+BENCHMARKS = {
+    'load_csv': bench_load_csv,
+    'load_report_columns': bench_load_report_columns,
+    'load_parquet_cache': bench_load_parquet_cache,
+    'top_tanks_in_tiers': bench_top_tanks_in_tiers,
+    'light_tanks_spotting': bench_light_tanks_spotting,
+    'tanks_max_average_damage': bench_tanks_max_average_damage,
+    'max_average_damage_in_types': bench_max_average_damage_in_types,
+    'total_battles': bench_total_battles,
+    'total_tanks': bench_total_tanks,
+    'compute_aggregates': bench_compute_aggregates,
+    'load_aggregates': bench_load_aggregates,
+}
+
+
+def prepare_data(data_dir: str, rows: int) -> str:
+    path = os.path.join(data_dir, f"wot_{rows}.csv")
+    if not os.path.exists(path):
+        generate_wot_csv(path, rows)
+    # кэш строим заранее, чтобы load_parquet_cache мерил теплое чтение
+    if not os.path.exists(get_cache_path(path)):
+        load_data(None, path, use_cache=True)
+    return path
+
+
+def run_benchmark(bench, path: str, df: pd.DataFrame, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        bench(path, df)
+        times.append(time.perf_counter() - start)
+
+    # память меряем отдельным прогоном: tracemalloc замедляет код
+    gc.collect()
+    tracemalloc.start()
+    bench(path, df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'min_s': min(times), 'median_s': statistics.median(times), 'peak_mb': peak / 2 ** 20}
+
+
+def run_suite(sizes: list[int], names: list[str], data_dir: str, repeat: int) -> dict:
+    results = {}
+    for rows in sizes:
+        path = prepare_data(data_dir, rows)
+        df = load_data(None, path)
+        for name in names:
+            print(f"[{rows}] {name}...")
+            results[f"{name}[{rows}]"] = run_benchmark(BENCHMARKS[name], path, df, repeat)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    print(f"\n{'benchmark':>40} {'base, s':>9} {'now, s':>9} {'ratio':>7} {'base MB':>9} {'now MB':>9}")
+    for key, now in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:>40} {'-':>9} {now['min_s']:>9.4f} {'new':>7} {'-':>9} {now['peak_mb']:>9.1f}")
+            continue
+        ratio = now['min_s'] / base['min_s'] if base['min_s'] else float('inf')
+        memory_ratio = now['peak_mb'] / base['peak_mb'] if base['peak_mb'] else 1.0
+        mark = ""
+        slower = ratio > 1 + threshold and now['min_s'] - base['min_s'] > MIN_TIME_DELTA_S
+        bigger = memory_ratio > 1 + threshold and now['peak_mb'] - base['peak_mb'] > MIN_MEMORY_DELTA_MB
+        if slower or bigger:
+            regressions.append(key)
+            mark = " <- regression"
+        elif ratio < 1 / (1 + threshold):
+            mark = " <- faster"
+        print(f"{key:>40} {base['min_s']:>9.4f} {now['min_s']:>9.4f} {ratio:>6.2f}x "
+              f"{base['peak_mb']:>9.1f} {now['peak_mb']:>9.1f}{mark}")
+    return regressions
+
+
+def print_results(results: dict):
+    print(f"\n{'benchmark':>40} {'min, s':>9} {'median, s':>10} {'peak MB':>9}")
+    for key, result in results.items():
+        print(f"{key:>40} {result['min_s']:>9.4f} {result['median_s']:>10.4f} {result['peak_mb']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lab_1 analytics benchmark suite")
+    parser.add_argument("--rows", default="10000,100000", help="comma separated sizes, 10k to 100M")
+    parser.add_argument("--bench", default=",".join(BENCHMARKS), help="comma separated benchmark names")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "wot_bench"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", default=None, help="write results as a baseline JSON")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    names = args.bench.split(",")
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = run_suite([int(rows) for rows in args.rows.split(",")], names, args.data_dir, args.repeat)
+    print_results(results)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or '.', exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(),
+                       'pandas': pd.__version__, 'results': results}, f, indent=2)
+        print(f"Baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions: {', '.join(regressions)}")
+            raise SystemExit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,73 @@
+import argparse
+
 from src.modules.data_module import *
+from src.modules.aggregate_module import *
 from src.modules.graphic_module import *
+from src.modules.render_module import render_report
+from src.modules.store_module import open_store, ingest_csv, read_aggregates
+from src.modules.sketch_module import load_sketches, approx_total_battles, approx_total_tanks, approx_top_tanks_in_tiers
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="World of Tanks battles report")
+    parser.add_argument("--headless", action="store_true", help="render charts to files instead of windows")
+    parser.add_argument("--out-dir", default="report")
+    parser.add_argument("--formats", default="png,svg")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--store", default=None, help="SQLite file with accumulated statistics")
+    parser.add_argument("--data", default="src/data/wot.csv")
+    parser.add_argument("--approximate", action="store_true",
+                        help="fast sketch estimates of totals and popular tanks with bounded error")
+    return parser.parse_args()
 
 
 def main():
-    wot_data = load_data(None,"src/data/wot.csv")
-    pd.set_option('display.max_columns', None)
-    pd.set_option('display.width', None)
-    print(wot_data.head(5))
-    wot_data.info()
-    print(f"Total battles - {get_total_battles(wot_data)}")
-    print(f"Total tanks - {get_total_tanks(wot_data)}")
-    show_top_tanks_by_tier(get_top_tanks_in_tears(wot_data), 10)
-    show_top_damage_by_detected_maps(get_light_tanks_spotting_asist(wot_data),10)
-    show_top10_damage_tanks(get_tanks_max_average_damage(wot_data,"MT",10), "MT")
-    show_top10_damage_tanks(get_tanks_max_average_damage(wot_data,"HT",10), "HT")
-    show_top10_damage_tanks(get_tanks_max_average_damage(wot_data,"TD",10), "TD")
-    show_top_tank_types_by_damage(get_max_average_damage_in_types(wot_data,["MT","HT","TD"]))
+    args = parse_args()
+
+    if args.approximate:
+        sketches = load_sketches([args.data])
+        print(f"Total battles ~ {approx_total_battles(sketches)}")
+        print(f"Total tanks ~ {approx_total_tanks(sketches)}")
+        top_tanks = approx_top_tanks_in_tiers(sketches)
+        if args.headless:
+            print(top_tanks.to_string(index=False))
+        else:
+            show_top_tanks_by_tier(top_tanks, 10)
+        return
+
+    if args.store:
+        # новые бои добавляются к накопленной статистике без пересчета всего датасета
+        conn = open_store(args.store)
+        try:
+            ingest_csv(conn, args.data)
+            report = read_aggregates(conn)
+        finally:
+            conn.close()
+    else:
+        wot_data = load_data(None, args.data, use_cache=True, columns=REPORT_COLUMNS)
+        pd.set_option('display.max_columns', None)
+        pd.set_option('display.width', None)
+        print(wot_data.head(5))
+        wot_data.info()
+
+        # все отчеты строятся из двух общих агрегатов
+        report = compute_aggregates(wot_data)
+
+    print(f"Total battles - {total_battles(report)}")
+    print(f"Total tanks - {total_tanks(report)}")
+
+    if args.headless:
+        render_report(report, args.out_dir, tuple(args.formats.split(",")), args.workers)
+        return
+
+    show_top_tanks_by_tier(top_tanks_in_tiers(report), 10)
+    show_top_damage_by_detected_maps(light_tanks_spotting_assist(report), 10)
+    show_top10_damage_tanks(tanks_max_average_damage(report, "MT", 10), "MT")
+    show_top10_damage_tanks(tanks_max_average_damage(report, "HT", 10), "HT")
+    show_top10_damage_tanks(tanks_max_average_damage(report, "TD", 10), "TD")
+    show_top_tank_types_by_damage(max_average_damage_in_types(report, ["MT", "HT", "TD"]))
     return
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
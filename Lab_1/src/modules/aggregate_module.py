@@ -0,0 +1,193 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Частичные агрегаты по боям, которые можно считать по кускам файла и складывать.
+# damage  - (class, name, tier): строк, сумма и число непустых damage
+# battles - (battle_time, display_name): число строк LT и их максимальный засвет
+# Из этих двух таблиц получаются те же результаты, что и у функций data_module.
+
+AGGREGATE_COLUMNS = ['battle_time', 'name', 'tier', 'class', 'display_name', 'damage', 'spotting_assist']
+DAMAGE_KEYS = ['class', 'name', 'tier']
+BATTLE_KEYS = ['battle_time', 'display_name']
+CSV_DTYPES = {'battle_time': str, 'name': str, 'class': str, 'display_name': str}
+
+
+def damage_aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    return (df.groupby(DAMAGE_KEYS, observed=True, dropna=False)['damage']
+            .agg(rows='size', damage_sum='sum', damage_count='count'))
+
+
+def battle_aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    is_lt = df['class'] == 'LT'
+    lt_values = pd.DataFrame({'lt_rows': is_lt.astype('int64'),
+                              'lt_max_spot': df['spotting_assist'].where(is_lt)})
+    battles = (lt_values.groupby([df[key] for key in BATTLE_KEYS], observed=True, dropna=False)
+               .agg(lt_rows=('lt_rows', 'sum'), lt_max_spot=('lt_max_spot', 'max')))
+    # бои без времени не учитываются ни в одном отчете
+    return battles[battles.index.get_level_values('battle_time').notna()]
+
+
+def compute_aggregates(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    # два прохода по данным на весь отчет
+    return {'damage': damage_aggregate(df), 'battles': battle_aggregate(df)}
+
+
+def merge_aggregates(parts: list[dict[str, pd.DataFrame]]) -> dict[str, pd.DataFrame]:
+    damage = (pd.concat([part['damage'] for part in parts])
+              .groupby(level=DAMAGE_KEYS, observed=True, dropna=False)
+              .sum())
+    battles = (pd.concat([part['battles'] for part in parts])
+               .groupby(level=BATTLE_KEYS, observed=True, dropna=False)
+               .agg({'lt_rows': 'sum', 'lt_max_spot': 'max'}))
+    return {'damage': damage, 'battles': battles}
+
+
+def load_aggregates(path: str, chunksize: int = 1_000_000) -> dict[str, pd.DataFrame]:
+    print(f"Aggregate data by chunks of {chunksize} rows...")
+    result = None
+    try:
+        reader = pd.read_csv(path, usecols=AGGREGATE_COLUMNS, dtype=CSV_DTYPES, chunksize=chunksize)
+        with reader:
+            for chunk in reader:
+                part = compute_aggregates(chunk)
+                # сливаем сразу, чтобы в памяти был только текущий кусок и итог
+                result = part if result is None else merge_aggregates([result, part])
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File scv not found in path: {path}")
+
+    if result is None:
+        return compute_aggregates(pd.DataFrame(columns=AGGREGATE_COLUMNS))
+    print(f"Data aggregated successfully!")
+    return result
+
+
+def split_byte_ranges(path: str, partitions: int) -> tuple[bytes, list[tuple[int, int]]]:
+    with open(path, 'rb') as f:
+        header = f.readline()
+    data_start = len(header)
+    size = os.path.getsize(path)
+    step = max(1, -(-(size - data_start) // partitions))
+    ranges = [(start, min(start + step, size)) for start in range(data_start, size, step)]
+    return header, ranges
+
+
+def read_byte_range(path: str, header: bytes, start: int, end: int) -> pd.DataFrame:
+    # строка относится к диапазону, в котором лежит ее первый байт;
+    # поля с переводом строки внутри кавычек в wot.csv не встречаются
+    with open(path, 'rb') as f:
+        f.seek(start - 1)
+        f.readline()
+        begin = f.tell()
+        f.seek(end - 1)
+        f.readline()
+        stop = f.tell()
+        f.seek(begin)
+        data = f.read(max(0, stop - begin))
+
+    return pd.read_csv(io.BytesIO(header + data), usecols=AGGREGATE_COLUMNS, dtype=CSV_DTYPES)
+
+
+def aggregate_byte_range(path: str, header: bytes, start: int, end: int) -> dict[str, pd.DataFrame]:
+    return compute_aggregates(read_byte_range(path, header, start, end))
+
+
+def load_aggregates_parallel(path: str, workers: int = None,
+                             partition_bytes: int = 64 * 1024 * 1024) -> dict[str, pd.DataFrame]:
+    workers = workers or os.cpu_count()
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File scv not found in path: {path}")
+
+    # кусков больше, чем процессов, чтобы ограничить память одного процесса
+    partitions = max(workers, -(-os.path.getsize(path) // partition_bytes))
+    header, ranges = split_byte_ranges(path, partitions)
+    print(f"Aggregate data in {len(ranges)} partitions on {workers} processes...")
+
+    if not ranges:
+        return compute_aggregates(pd.DataFrame(columns=AGGREGATE_COLUMNS))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map сохраняет порядок кусков, поэтому слияние детерминировано
+        parts = list(executor.map(aggregate_byte_range,
+                                  [path] * len(ranges),
+                                  [header] * len(ranges),
+                                  [start for start, _ in ranges],
+                                  [end for _, end in ranges]))
+
+    print(f"Data aggregated successfully!")
+    return merge_aggregates(parts)
+
+
+def plain_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # категории из parquet-кэша не отдаем наружу: seaborn рисует все категории, а не только строки
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(df[col].cat.categories.dtype)
+    return df
+
+
+def total_battles(aggregates: dict[str, pd.DataFrame]) -> int:
+    return aggregates['battles'].index.get_level_values('battle_time').nunique()
+
+
+def total_tanks(aggregates: dict[str, pd.DataFrame]) -> int:
+    return aggregates['damage'].index.get_level_values('name').nunique()
+
+
+def top_tanks_in_tiers(aggregates: dict[str, pd.DataFrame], top_size: int = 10) -> pd.DataFrame:
+    tank_count = (aggregates['damage']['rows']
+                  .groupby(level=['tier', 'name'], observed=True)
+                  .sum()
+                  .div(total_battles(aggregates))
+                  .round(2)
+                  .reset_index(name='counts'))
+    tank_count = plain_columns(tank_count)
+
+    return (tank_count.sort_values(['tier', 'counts'], ascending=[True, False])
+            .groupby('tier')
+            .head(top_size))
+
+
+def light_tanks_spotting_assist(aggregates: dict[str, pd.DataFrame], top_n: int = 10) -> pd.DataFrame:
+    lt_maps = aggregates['battles']
+    lt_maps = lt_maps[lt_maps['lt_rows'] > 0]['lt_max_spot']
+    # лучший засвет боя приписываем каждой карте этого боя
+    best_battle_spot = lt_maps.groupby(level='battle_time', observed=True).transform('max')
+
+    return (best_battle_spot.groupby(level='display_name', observed=True)
+            .mean()
+            .rename('max_spot')
+            .reset_index()
+            .sort_values('max_spot', ascending=False)
+            .head(top_n)
+            .reset_index(drop=True)
+            .pipe(plain_columns))
+
+
+def tanks_max_average_damage(aggregates: dict[str, pd.DataFrame], tank_type: str, top_n: int = 10) -> pd.DataFrame:
+    damage = aggregates['damage']
+    tank_class = damage[damage.index.get_level_values('class') == tank_type].droplevel('class')
+    tank_class = tank_class.groupby(level=['name', 'tier'], observed=True).sum()
+
+    avg_tank_damage = ((tank_class['damage_sum'] / tank_class['damage_count'])
+                       .sort_values(ascending=False)
+                       .head(top_n)
+                       .reset_index())
+
+    avg_tank_damage.columns = ['name', 'tier', 'avg_damage']
+    avg_tank_damage = plain_columns(avg_tank_damage)
+    avg_tank_damage['type'] = tank_type
+    return avg_tank_damage.round(0)
+
+
+def max_average_damage_in_types(aggregates: dict[str, pd.DataFrame], tank_types: list[str]) -> pd.DataFrame:
+    res_data = [tanks_max_average_damage(aggregates, t_type, 1) for t_type in tank_types]
+
+    if res_data:
+        return (pd.concat(res_data)
+                .sort_values(by=['avg_damage'], ascending=False)
+                .reset_index(drop=True))
+    else:
+        return pd.DataFrame(columns=['name', 'tier', 'avg_damage', 'type'])
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CATEGORY_COLUMNS = ['name', 'class', 'display_name', 'battle_time']
+SOURCE_META_KEY = b'wot_source'
+
+
+def get_cache_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def get_file_hash(path: str, block_size: int = 1 << 20) -> str:
+    file_hash = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def get_source_fingerprint(path: str, use_hash: bool = False) -> dict:
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if use_hash:
+        fingerprint["sha1"] = get_file_hash(path)
+    return fingerprint
+
+
+def read_cache_fingerprint(cache_path: str) -> dict | None:
+    if not os.path.exists(cache_path):
+        return None
+    metadata = pq.read_schema(cache_path).metadata or {}
+    if SOURCE_META_KEY not in metadata:
+        return None
+    return json.loads(metadata[SOURCE_META_KEY])
+
+
+def is_cache_fresh(path: str, cache_path: str, use_hash: bool = False) -> bool:
+    cached = read_cache_fingerprint(cache_path)
+    if cached is None:
+        return False
+
+    current = get_source_fingerprint(path, use_hash=False)
+    if cached["size"] == current["size"] and cached["mtime_ns"] == current["mtime_ns"]:
+        return True
+    # файл могли перезаписать тем же содержимым - тогда сверяем хэш
+    return use_hash and "sha1" in cached and cached["sha1"] == get_file_hash(path)
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype('category')
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        elif pd.api.types.is_float_dtype(df[col]):
+            values = df[col].dropna()
+            # дробные значения не трогаем, чтобы не терять точность в средних
+            if len(values) and (values == values.round()).all():
+                if values.abs().max() < 2 ** 31:
+                    df[col] = df[col].astype('Int32')
+                else:
+                    df[col] = df[col].astype('Int64')
+    return df
+
+
+def build_cache(path: str, cache_path: str, use_hash: bool = False) -> None:
+    print(f"Build parquet cache {cache_path}...")
+    df = optimize_dtypes(pd.read_csv(path, low_memory=False))
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fingerprint = json.dumps(get_source_fingerprint(path, use_hash=use_hash)).encode()
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SOURCE_META_KEY: fingerprint})
+    pq.write_table(table, cache_path, compression='zstd')
+
+
+def load_cached(path: str, num_rows: int = None, columns: list[str] = None,
+                use_hash: bool = False) -> pd.DataFrame:
+    cache_path = get_cache_path(path)
+    if not is_cache_fresh(path, cache_path, use_hash=use_hash):
+        build_cache(path, cache_path, use_hash=use_hash)
+
+    if num_rows:
+        batch = next(pq.ParquetFile(cache_path).iter_batches(batch_size=num_rows, columns=columns), None)
+        if batch is not None:
+            return batch.to_pandas()
+
+    return pd.read_parquet(cache_path, columns=columns)
@@ -0,0 +1,88 @@
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from src.modules.aggregate_module import (top_tanks_in_tiers, light_tanks_spotting_assist,
+                                          tanks_max_average_damage, max_average_damage_in_types)
+from src.modules.graphic_module import (TIERS, draw_top_tanks_by_tier, draw_top_damage_by_detected_maps,
+                                        draw_top10_damage_tanks, draw_top_tank_types_by_damage)
+
+# Пакетный рендер отчета в файлы без окон: backend Agg, графики делятся
+# между процессами, каждый процесс переиспользует фигуры одного размера.
+
+DAMAGE_CLASSES = ["MT", "HT", "TD"]
+
+
+def build_chart_jobs(report: dict, top_n: int = 10) -> list[tuple]:
+    top_tanks = top_tanks_in_tiers(report)
+
+    jobs = [(f"top_tanks_tier_{tier}", draw_top_tanks_by_tier, (top_tanks, tier, top_n), (10, 5))
+            for tier in TIERS]
+    jobs.append(("lt_spotting_by_map", draw_top_damage_by_detected_maps,
+                 (light_tanks_spotting_assist(report, top_n), top_n), (12, 8)))
+    for class_type in DAMAGE_CLASSES:
+        jobs.append((f"top_damage_{class_type}", draw_top10_damage_tanks,
+                     (tanks_max_average_damage(report, class_type, top_n), class_type), (12, 6)))
+    jobs.append(("top_damage_by_type", draw_top_tank_types_by_damage,
+                 (max_average_damage_in_types(report, DAMAGE_CLASSES),), (12, 6)))
+    return jobs
+
+
+def init_render_worker():
+    plt.switch_backend('Agg')
+    sns.set_style('darkgrid')
+
+
+def render_charts(jobs: list[tuple], out_dir: str, formats: tuple[str, ...]) -> list[str]:
+    figures = {}
+    files = []
+    try:
+        for name, draw, args, figsize in jobs:
+            fig = figures.get(figsize)
+            if fig is None:
+                fig = figures[figsize] = plt.figure(figsize=figsize)
+            fig.clear()
+
+            draw(fig.add_subplot(), *args)
+            fig.tight_layout()
+            for fmt in formats:
+                path = os.path.join(out_dir, f"{name}.{fmt}")
+                fig.savefig(path, format=fmt)
+                files.append(path)
+    finally:
+        for fig in figures.values():
+            plt.close(fig)
+    return files
+
+
+def write_index(out_dir: str, chart_names: list[str], image_format: str) -> str:
+    items = "\n".join(
+        f'  <figure><img src="{html.escape(name)}.{image_format}" alt="{html.escape(name)}">'
+        f'<figcaption>{html.escape(name)}</figcaption></figure>'
+        for name in chart_names)
+    index_path = os.path.join(out_dir, "index.html")
+    with open(index_path, 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>WoT report</title></head>\n"
+                f"<body>\n{items}\n</body>\n</html>\n")
+    return index_path
+
+
+def render_report(report: dict, out_dir: str = "report", formats: tuple[str, ...] = ("png", "svg"),
+                  workers: int = None, top_n: int = 10) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = build_chart_jobs(report, top_n)
+    workers = max(1, min(workers or os.cpu_count(), len(jobs)))
+    batches = [jobs[i::workers] for i in range(workers)]
+
+    print(f"Render {len(jobs)} charts on {workers} processes to {out_dir}...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker) as executor:
+        rendered = sum(len(files) for files in executor.map(render_charts, batches,
+                                                            [out_dir] * workers,
+                                                            [formats] * workers))
+
+    index_path = write_index(out_dir, [name for name, *_ in jobs], formats[0])
+    print(f"Saved {rendered} files, index: {index_path}")
+    return index_path
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+# Приближенный режим для больших выгрузок: вместо точных nunique и полных
+# таблиц групп храним скетчи фиксированного размера.
+# hll_*  - HyperLogLog, число разных боев и танков (ошибка ~1.04 / sqrt(2^p))
+# cms_*  - Count-Min, оценка числа строк танка сверху (ошибка <= e / width * N)
+# ss_*   - Space-Saving, кандидаты в самые популярные танки каждого уровня
+# Все скетчи складываются, поэтому их можно считать по файлам и кускам отдельно.
+
+SKETCH_COLUMNS = ['battle_time', 'name', 'tier']
+SKETCH_DTYPES = {'battle_time': str, 'name': str}
+
+HLL_PRECISION = 14
+CMS_DEPTH = 4
+CMS_WIDTH = 1 << 14
+SS_CAPACITY = 64
+
+# нечетные множители для multiply-shift хэширования строк Count-Min
+CMS_SEEDS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93],
+                     dtype=np.uint64)
+
+
+def hash_values(values: pd.Series | pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+def hash_distinct(values: pd.Series) -> np.ndarray:
+    # повторы не меняют регистры HyperLogLog, поэтому хэшируем только разные значения куска
+    return hash_values(pd.Series(values.dropna().unique()).astype(str))
+
+
+def hll_new(precision: int = HLL_PRECISION) -> np.ndarray:
+    return np.zeros(1 << precision, dtype=np.uint8)
+
+
+def hll_add(registers: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    precision = int(np.log2(len(registers)))
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    # ранг - позиция первой единицы в оставшихся битах; старшие 53 бита
+    # переводятся во float без потерь, и frexp отдает номер старшего бита
+    rest = (hashes << np.uint64(precision)) >> np.uint64(11)
+    _, exponent = np.frexp(rest.astype(np.float64))
+    rank = np.where(rest == 0, 64 - precision + 1, 54 - exponent).astype(np.uint8)
+    np.maximum.at(registers, index, rank)
+    return registers
+
+
+def hll_merge(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    return np.maximum(left, right)
+
+
+def hll_count(registers: np.ndarray) -> int:
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = np.count_nonzero(registers == 0)
+    # на малых количествах точнее линейный подсчет пустых регистров
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)
+    return int(round(estimate))
+
+
+def cms_new(depth: int = CMS_DEPTH, width: int = CMS_WIDTH) -> np.ndarray:
+    return np.zeros((depth, width), dtype=np.int64)
+
+
+def cms_columns(table: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    depth, width = table.shape
+    shift = np.uint64(64 - int(np.log2(width)))
+    return np.stack([(hashes * CMS_SEEDS[row]) >> shift for row in range(depth)]).astype(np.int64)
+
+
+def cms_add(table: np.ndarray, hashes: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    for row, columns in enumerate(cms_columns(table, hashes)):
+        table[row] += np.bincount(columns, weights=counts, minlength=table.shape[1]).astype(np.int64)
+    return table
+
+
+def cms_estimate(table: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    columns = cms_columns(table, hashes)
+    return np.min(table[np.arange(table.shape[0])[:, None], columns], axis=0)
+
+
+def ss_trim(counts: pd.Series, capacity: int) -> pd.Series:
+    # в каждом уровне оставляем capacity самых частых кандидатов
+    return (counts.sort_values(ascending=False, kind='stable')
+            .groupby(level='tier', sort=False)
+            .head(capacity)
+            .sort_index())
+
+
+def ss_merge(left: pd.Series, right: pd.Series, capacity: int = SS_CAPACITY) -> pd.Series:
+    # ключ, которого нет в полной сводке уровня, мог иметь до ее минимального счетчика
+    def floor(summary: pd.Series, other: pd.Series) -> pd.Series:
+        tier_min = summary.groupby(level='tier').min()
+        full = summary.groupby(level='tier').size() >= capacity
+        missing = other.index.difference(summary.index)
+        tiers = missing.get_level_values('tier')
+        bound = tier_min.where(full, 0).reindex(tiers).fillna(0).to_numpy(dtype=np.int64)
+        return pd.concat([summary, pd.Series(bound, index=missing, dtype=np.int64)])
+
+    merged = floor(left, right).add(floor(right, left), fill_value=0).astype(np.int64)
+    return ss_trim(merged, capacity)
+
+
+def new_sketches() -> dict:
+    return {'battles': hll_new(), 'tanks': hll_new(), 'tank_rows': cms_new(),
+            'top_tanks': pd.Series(dtype=np.int64, index=pd.MultiIndex.from_tuples([], names=['tier', 'name']))}
+
+
+def build_sketches(df: pd.DataFrame) -> dict:
+    sketches = new_sketches()
+    hll_add(sketches['battles'], hash_distinct(df['battle_time']))
+    hll_add(sketches['tanks'], hash_distinct(df['name']))
+
+    tanks = df[['tier', 'name']].dropna().astype({'tier': 'int64', 'name': str})
+    # строки куска сначала сворачиваем, дальше скетчи обновляются по уникальным танкам
+    chunk_counts = tanks.groupby(['tier', 'name'], observed=True).size()
+    keys = chunk_counts.index.to_frame(index=False)
+    cms_add(sketches['tank_rows'], hash_values(keys),
+            chunk_counts.to_numpy(dtype=np.float64))
+    sketches['top_tanks'] = ss_trim(chunk_counts.astype(np.int64), SS_CAPACITY)
+    return sketches
+
+
+def merge_sketches(parts: list[dict]) -> dict:
+    result = new_sketches()
+    for part in parts:
+        result['battles'] = hll_merge(result['battles'], part['battles'])
+        result['tanks'] = hll_merge(result['tanks'], part['tanks'])
+        result['tank_rows'] = result['tank_rows'] + part['tank_rows']
+        result['top_tanks'] = ss_merge(result['top_tanks'], part['top_tanks'])
+    return result
+
+
+def load_sketches(paths: list[str], chunksize: int = 1_000_000) -> dict:
+    print(f"Build sketches for {len(paths)} files by chunks of {chunksize} rows...")
+    result = new_sketches()
+    for path in paths:
+        try:
+            with pd.read_csv(path, usecols=SKETCH_COLUMNS, dtype=SKETCH_DTYPES, chunksize=chunksize) as reader:
+                for chunk in reader:
+                    result = merge_sketches([result, build_sketches(chunk)])
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File scv not found in path: {path}")
+
+    print(f"Sketches built successfully!")
+    return result
+
+
+def approx_total_battles(sketches: dict) -> int:
+    return hll_count(sketches['battles'])
+
+
+def approx_total_tanks(sketches: dict) -> int:
+    return hll_count(sketches['tanks'])
+
+
+def approx_top_tanks_in_tiers(sketches: dict, top_size: int = 10) -> pd.DataFrame:
+    candidates = sketches['top_tanks']
+    keys = candidates.index.to_frame(index=False)
+    # обе оценки завышены, поэтому берем меньшую
+    rows = np.minimum(candidates.to_numpy(),
+                      cms_estimate(sketches['tank_rows'], hash_values(keys.astype({'tier': 'int64', 'name': str}))))
+
+    tank_count = keys.assign(counts=np.round(rows / approx_total_battles(sketches), 2))
+    return (tank_count.sort_values(['tier', 'counts'], ascending=[True, False])
+            .groupby('tier')
+            .head(top_size))
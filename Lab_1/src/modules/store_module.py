@@ -0,0 +1,158 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from src.modules.aggregate_module import DAMAGE_KEYS, BATTLE_KEYS, compute_aggregates, read_byte_range
+
+# Постоянное хранилище агрегатов (SQLite): суммы и счетчики по танкам и
+# максимум засвета LT по боям. Новая партия боев добавляется к накопленным
+# значениям, поэтому время обновления зависит только от размера партии.
+# Для каждого файла хранится смещение после последней прочитанной строки:
+# повторная загрузка читает только дописанные в конец строки, и каждая строка
+# (в том числе без battle_time) учитывается ровно один раз. Смещение
+# обновляется в той же транзакции, что и агрегаты.
+
+# в ключах SQLite NULL не совпадает сам с собой, поэтому пустые значения храним так
+NULL_TEXT = ''
+NULL_TIER = -1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS damage (
+    class TEXT NOT NULL,
+    name TEXT NOT NULL,
+    tier INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    damage_sum NUMERIC NOT NULL,
+    damage_count INTEGER NOT NULL,
+    PRIMARY KEY (class, name, tier)
+);
+CREATE TABLE IF NOT EXISTS battles (
+    battle_time TEXT NOT NULL,
+    display_name TEXT NOT NULL,
+    lt_rows INTEGER NOT NULL,
+    lt_max_spot REAL,
+    PRIMARY KEY (battle_time, display_name)
+);
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path TEXT PRIMARY KEY,
+    header BLOB NOT NULL,
+    offset INTEGER NOT NULL
+);
+"""
+
+
+def open_store(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def encode_keys(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.reset_index()
+    for col in df.columns:
+        if col == 'tier':
+            df[col] = df[col].astype('float64').fillna(NULL_TIER).astype('int64')
+        elif col in DAMAGE_KEYS + BATTLE_KEYS:
+            df[col] = df[col].astype(object).where(df[col].notna(), NULL_TEXT).astype(str)
+    return df
+
+
+def decode_keys(df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    for col in keys:
+        null_value = NULL_TIER if col == 'tier' else NULL_TEXT
+        if (df[col] == null_value).any():
+            df[col] = df[col].where(df[col] != null_value)
+    return df.set_index(keys)
+
+
+def ingest_batch(conn: sqlite3.Connection, df: pd.DataFrame, mark: tuple = None) -> int:
+    # mark - (path, header, offset): до какого места файла учтены строки этой партии
+    with conn:
+        if not df.empty:
+            upsert_aggregates(conn, df)
+        if mark is not None:
+            conn.execute("""
+                INSERT INTO ingested_files (path, header, offset) VALUES (?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET header = excluded.header, offset = excluded.offset
+            """, mark)
+    return len(df)
+
+
+def upsert_aggregates(conn: sqlite3.Connection, df: pd.DataFrame):
+    aggregates = compute_aggregates(df)
+    damage = encode_keys(aggregates['damage'])[DAMAGE_KEYS + ['rows', 'damage_sum', 'damage_count']]
+    battles = encode_keys(aggregates['battles'])[BATTLE_KEYS + ['lt_rows', 'lt_max_spot']]
+    battles = battles.astype(object).where(battles.notna(), None)
+
+    conn.executemany("""
+        INSERT INTO damage (class, name, tier, rows, damage_sum, damage_count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (class, name, tier) DO UPDATE SET
+            rows = rows + excluded.rows,
+            damage_sum = damage_sum + excluded.damage_sum,
+            damage_count = damage_count + excluded.damage_count
+    """, damage.itertuples(index=False, name=None))
+
+    # бой может продолжиться в дописанной части файла - его значения сливаются с уже сохраненными;
+    # max() в SQLite с NULL дает NULL, поэтому добираем непустое значение через coalesce
+    conn.executemany("""
+        INSERT INTO battles (battle_time, display_name, lt_rows, lt_max_spot)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (battle_time, display_name) DO UPDATE SET
+            lt_rows = lt_rows + excluded.lt_rows,
+            lt_max_spot = coalesce(max(lt_max_spot, excluded.lt_max_spot), lt_max_spot, excluded.lt_max_spot)
+    """, battles.itertuples(index=False, name=None))
+
+
+def complete_lines_end(path: str) -> int:
+    # конец последней полной строки: недописанная строка будет прочитана в следующий раз
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        position = size
+        while position > 0:
+            step = min(64 * 1024, position)
+            f.seek(position - step)
+            block = f.read(step)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                return position - step + newline + 1
+            position -= step
+    return 0
+
+
+def ingest_csv(conn: sqlite3.Connection, path: str, chunk_bytes: int = 64 * 1024 * 1024) -> int:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File scv not found in path: {path}")
+    key = os.path.abspath(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+    end = complete_lines_end(path)
+
+    row = conn.execute("SELECT header, offset FROM ingested_files WHERE path = ?", (key,)).fetchone()
+    offset = len(header)
+    if row is not None:
+        if bytes(row[0]) == header and row[1] <= end:
+            offset = row[1]
+        else:
+            # другой заголовок или файл стал короче - это уже другой файл, читаем его целиком
+            print(f"File {path} was replaced, ingest it from the beginning")
+
+    print(f"Ingest {max(0, end - offset)} new bytes from {path}...")
+    ingested = 0
+    for start in range(offset, end, chunk_bytes):
+        stop = min(start + chunk_bytes, end)
+        # read_byte_range берет строки, которые начинаются в [start, stop); stop всегда после '\n'
+        ingested += ingest_batch(conn, read_byte_range(path, header, start, stop), (key, header, stop))
+
+    print(f"Ingested {ingested} new rows")
+    return ingested
+
+
+def read_aggregates(conn: sqlite3.Connection) -> dict[str, pd.DataFrame]:
+    damage = pd.read_sql_query(
+        "SELECT class, name, tier, rows, damage_sum, damage_count FROM damage ORDER BY class, name, tier", conn)
+    battles = pd.read_sql_query(
+        "SELECT battle_time, display_name, lt_rows, lt_max_spot FROM battles ORDER BY battle_time, display_name",
+        conn)
+    return {'damage': decode_keys(damage, DAMAGE_KEYS), 'battles': decode_keys(battles, BATTLE_KEYS)}
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# тесты импортируют модули как src.modules.*, так же как main.py из папки Lab_1
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
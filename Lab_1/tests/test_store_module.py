@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from src.modules.aggregate_module import (AGGREGATE_COLUMNS, CSV_DTYPES, compute_aggregates, total_battles,
+                                          total_tanks, max_average_damage_in_types)
+from src.modules.store_module import open_store, ingest_csv, read_aggregates
+
+
+def make_rows(count, seed, first_battle=0):
+    rng = np.random.default_rng(seed)
+    battles = first_battle + rng.integers(0, count // 10 + 1, count)
+    df = pd.DataFrame({
+        'battle_time': [f"2024-01-01 00:{b // 60:02d}:{b % 60:02d}" for b in battles],
+        'name': rng.choice(['T-34', 'IS-7', 'Leopard', 'Maus', 'E 100'], count),
+        'tier': rng.integers(5, 11, count),
+        'class': rng.choice(['LT', 'MT', 'HT', 'TD'], count),
+        'display_name': rng.choice(['player1', 'player2', 'player3'], count),
+        'damage': rng.integers(0, 5000, count).astype(float),
+        'spotting_assist': rng.integers(0, 3000, count).astype(float),
+    })
+    # строки без боя, с пропусками в ключах и в значениях
+    df.loc[rng.random(count) < 0.05, 'battle_time'] = np.nan
+    df.loc[rng.random(count) < 0.02, 'tier'] = np.nan
+    df.loc[rng.random(count) < 0.05, 'damage'] = np.nan
+    return df[AGGREGATE_COLUMNS]
+
+
+def summary(report):
+    return (total_battles(report), total_tanks(report),
+            max_average_damage_in_types(report, ['MT', 'HT', 'TD']).round(6).to_dict('records'),
+            int(report['damage']['rows'].sum()))
+
+
+def expected(path):
+    return summary(compute_aggregates(pd.read_csv(path, usecols=AGGREGATE_COLUMNS, dtype=CSV_DTYPES)))
+
+
+def test_same_file_twice_keeps_totals(tmp_path):
+    path = tmp_path / "wot.csv"
+    make_rows(2000, seed=1).to_csv(path, index=False)
+    conn = open_store(str(tmp_path / "store.sqlite"))
+
+    assert ingest_csv(conn, str(path), chunk_bytes=4096) == 2000
+    first = summary(read_aggregates(conn))
+    assert first == expected(path)
+
+    assert ingest_csv(conn, str(path)) == 0
+    assert summary(read_aggregates(conn)) == first
+    conn.close()
+
+
+def test_appended_rows_are_ingested_once(tmp_path):
+    path = tmp_path / "wot.csv"
+    make_rows(1500, seed=2).to_csv(path, index=False)
+    conn = open_store(str(tmp_path / "store.sqlite"))
+    ingest_csv(conn, str(path))
+
+    # дописанная часть продолжает последние бои, последняя строка пока без '\n'
+    tail = make_rows(800, seed=3, first_battle=140).to_csv(index=False, header=False)
+    with open(path, 'a') as f:
+        f.write(tail[:-1])
+    assert ingest_csv(conn, str(path)) == 799
+    with open(path, 'a') as f:
+        f.write("\n")
+    assert ingest_csv(conn, str(path)) == 1
+    assert ingest_csv(conn, str(path)) == 0
+
+    assert summary(read_aggregates(conn)) == expected(path)
+    conn.close()
@@ -1,13 +1,31 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy import create_engine, text
+from psycopg2.errors import QueryCanceled
 from openai import OpenAI
 import plotly.express as px
 from pathlib import Path
 import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 
 from dotenv import load_dotenv
 
+from bulk_load import copy_dataframe, normalize_column_name
+from query_cache import QueryCache
+from sql_runner import run_limited, SQL_MAX_ROWS, SQL_TIMEOUT_MS
+from downsample import downsample_for_plot
+from stream_parser import SqlFenceDetector
+from sql_guard import admit_query, QueryRejected
+from llm_scheduler import FairScheduler, LLM_MAX_CONCURRENT
+from bulk_ingest import ingest_directory, INGEST_WORKERS
+from schema_context import load_schema, build_schema_context
+from prompts import build_messages, build_rewrite_messages
+from prices import PRICES_TABLE, LAYOUTS, read_price_csv, ticker_from_filename, load_prices
+
 load_dotenv()
 
 DB_CONFIG = {
@@ -22,7 +40,14 @@ print(DB_CONFIG)
 
 DB_URL = (f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}"
           f"@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}")
-LLM_URL = "http://localhost:1234/v1"
+LLM_URL = os.getenv("LLM_URL", "http://localhost:1234/v1")
+# postgres - таблицы, загруженные в базу; duckdb - встроенный DuckDB прямо над datasets
+QUERY_BACKEND = os.getenv("QUERY_BACKEND", "postgres")
+# загрузка папки со страницы разрешена только внутри этой папки
+DATASETS_ROOT = Path(os.getenv("DATASETS_DIR", str(Path(__file__).resolve().parents[2] / "datasets"))).resolve()
+
+if QUERY_BACKEND == "duckdb":
+    import duckdb_backend
 
 
 @st.cache_resource
@@ -32,6 +57,25 @@ def get_engine():
 
 engine = get_engine()
 
+
+@st.cache_resource
+def get_query_cache():
+    # общий для всех сессий: данные в базе тоже общие
+    return QueryCache()
+
+
+query_cache = get_query_cache()
+
+
+@st.cache_resource
+def get_duckdb():
+    # Parquet пересобирается только для изменившихся CSV
+    return duckdb_backend.connect()
+
+
+duckdb_conn = get_duckdb() if QUERY_BACKEND == "duckdb" else None
+
+
 def get_existing_tables():
     try:
         with engine.connect() as conn:
@@ -51,94 +95,133 @@ def get_existing_tables():
 def upload_csv_to_table(file, table_name, if_exists="replace"):
     try:
         df = pd.read_csv(file)
-        df.columns = [col.strip().lower().replace(" ", "_").replace("-", "_").replace("__", "_") for col in df.columns]
+        df.columns = [normalize_column_name(col) for col in df.columns]
         with st.spinner(f"Загружаем данные в таблицу '{table_name}'..."):
-            df.to_sql(table_name, engine, if_exists=if_exists, index=False, chunksize=50_000, method="multi")
-        row_count = len(df)
-        st.success(f"Успешно загружено **{row_count:,}** строк в таблицу `{table_name}`")
+            row_count, elapsed = copy_dataframe(df, engine, table_name, if_exists=if_exists, chunk_rows=50_000)
+        st.success(f"Успешно загружено **{row_count:,}** строк в таблицу `{table_name}` "
+                   f"за {elapsed:.2f} с ({row_count / max(elapsed, 1e-9):,.0f} строк/с)")
         st.subheader("Первые 5 строк загруженных данных")
         st.dataframe(df.head())
     except Exception as e:
         st.error(f"Ошибка при загрузке:\n{str(e)}")
+    finally:
+        # таблица могла измениться даже при ошибке посреди загрузки
+        query_cache.invalidate_table(table_name)
+        get_database_schema.clear()
+
+
+@st.cache_resource
+def get_ingest_executors():
+    # процессы разбора CSV запускаются один раз и общие для всех сессий, а не на каждое нажатие
+    return ProcessPoolExecutor(max_workers=INGEST_WORKERS), ThreadPoolExecutor(max_workers=INGEST_WORKERS)
+
+
+def resolve_datasets_dir(directory):
+    # относительный путь считается от DATASETS_ROOT; ссылки и '..' раскрываются до проверки
+    path = (DATASETS_ROOT / directory).resolve()
+    if not path.is_relative_to(DATASETS_ROOT):
+        raise ValueError(f"Папка '{directory}' находится вне {DATASETS_ROOT}")
+    return path
+
+
+def upload_directory(directory, if_exists="replace"):
+    try:
+        directory = resolve_datasets_dir(directory)
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    parsers, loaders = get_ingest_executors()
+    try:
+        with st.spinner(f"Загружаем CSV-файлы из папки '{directory}'..."):
+            report, total_time = ingest_directory(engine, directory, if_exists=if_exists,
+                                                  parsers=parsers, loaders=loaders)
+        rows = sum(item["rows"] for item in report)
+        st.success(f"Успешно загружено **{rows:,}** строк из {len(report)} файлов за {total_time:.2f} с "
+                   f"({rows / max(total_time, 1e-9):,.0f} строк/с)")
+        st.dataframe(pd.DataFrame(report))
+    except BrokenProcessPool as e:
+        # упавший процесс ломает весь пул, следующая загрузка создаст новый
+        get_ingest_executors.clear()
+        st.error(f"Ошибка при загрузке:\n{str(e)}")
+    except Exception as e:
+        st.error(f"Ошибка при загрузке:\n{str(e)}")
+    finally:
+        # ошибка в одном файле не отменяет уже загруженные таблицы
+        for table_name in [ticker_from_filename(path.name) for path in directory.glob("*.csv")]:
+            query_cache.invalidate_table(table_name)
+        get_database_schema.clear()
+
+
+def upload_prices(files, layout, mode):
+    try:
+        df = pd.concat([read_price_csv(file, ticker_from_filename(file.name)) for file in files],
+                       ignore_index=True)
+        with st.spinner(f"Загружаем {len(files)} файлов в таблицу '{PRICES_TABLE}'..."):
+            row_count, elapsed = load_prices(engine, df, layout=layout, mode=mode)
+        st.success(f"Успешно загружено **{row_count:,}** строк по {df['ticker'].nunique()} тикерам "
+                   f"в таблицу `{PRICES_TABLE}` за {elapsed:.2f} с")
+    except Exception as e:
+        st.error(f"Ошибка при загрузке:\n{str(e)}")
+    finally:
+        query_cache.invalidate_table(PRICES_TABLE)
+        get_database_schema.clear()
 
 
 @st.cache_data(ttl=300)
 def get_database_schema():
     try:
+        if QUERY_BACKEND == "duckdb":
+            return duckdb_backend.load_schema(duckdb_conn)
         with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT 
-                    table_name,
-                    string_agg(
-                        column_name || ' ' || data_type ||
-                        CASE WHEN character_maximum_length IS NOT NULL 
-                             THEN '(' || character_maximum_length || ')' 
-                             ELSE '' 
-                        END ||
-                        CASE WHEN is_nullable = 'NO' THEN ' NOT NULL' ELSE '' END,
-                        E',\n    '
-                    ) as columns
-                FROM information_schema.columns
-                WHERE table_schema = 'public'
-                  AND table_name NOT IN ('pg_stat_statements')  -- можно исключить служебные
-                GROUP BY table_name
-                ORDER BY table_name;
-            """))
+            return load_schema(conn)
+    except Exception as e:
+        st.error(f"Не удалось получить схему базы данных\n{str(e)}")
+        return {"tables": {}, "prices": None}
 
-            schema_lines = ["Схема базы данных (PostgreSQL):\n"]
-            for table, cols in result:
-                schema_lines.append(f"Таблица: {table}")
-                schema_lines.append(f"    {cols}")
-                schema_lines.append("")
 
-            return "\n".join(schema_lines)
+@st.cache_resource
+def get_llm_client():
+    # один клиент на все сессии: соединения с сервером модели переиспользуются
+    return OpenAI(base_url=LLM_URL, api_key="not_needed", timeout=120, max_retries=0)
 
-    except Exception as e:
-        st.error(f"Не удалось получить схему базы данных\n{str(e)}")
-        return "Ошибка получения схемы базы данных."
-
-
-def generate_response(question):
-    prompt = f"""Ты эксперт по анализу финансовых данных акций и SQL/Plotly в Streamlit.
-
-    Схема базы данных (используй ТОЛЬКО эти таблицы и колонки!):
-    {get_database_schema()}
-    
-    ВАЖНЫЕ ПРАВИЛА ОТВЕТА (строго соблюдай!):
-    1. Отвечай ТОЛЬКО на русском языке.
-    2. Если запрос НЕ требует данных из БД и НЕ про графики → дай простой текстовый ответ.
-    3. Если нужно показать данные, статистику или список → генерируй ТОЛЬКО SQL-запрос в блоке ```sql ... ```
-    4. Если запрос про график, диаграмму, chart, plot или визуализацию → ОБЯЗАТЕЛЬНО генерируй:
-       - Сначала SQL-запрос в ```sql ... ```
-       - Сразу после него блок ```plot ... ``` с параметрами в ОДНОЙ строке: type=line x=date y=close title=Динамика цены Amazon
-       Возможные type: line, bar, scatter, histogram
-       Для сравнения компаний: в y через запятую (y=close_amzn,close_aapl), в SQL используй JOIN или UNION ALL по date.
-    5. После SQL и plot можно добавить 1-2 предложения комментария на русском.
-    6. Поле date хранится как text в формате YY-MM-DD → всегда кастуй к date: WHERE date::date >= CURRENT_DATE - INTERVAL '30 days', в SELECT date::date для группировок, в UNION ALL давай AS для колонок.
-    7. Блок plot всегда в тройных обратных кавычках: ```plot type=...```
-    
-    Пример ответа на запрос "Построй график close Amazon и Apple за последний месяц":
-    ```sql
-    SELECT a.date::date AS date, a.close AS close_amzn, p.close AS close_aapl 
-    FROM amazon a 
-    JOIN apple p ON a.date = p.date 
-    WHERE a.date::date >= CURRENT_DATE - INTERVAL '30 days' 
-    ORDER BY a.date::date;```
-    
-    ```plot type=line x=date y=close_amzn,close_aapl title=Сравнение цен закрытия Amazon и Apple за 30 дней```
-    
-    Вот сравнение цен акций за последний месяц.
-    Текущий запрос пользователя: {question}
-    """
 
+@st.cache_resource
+def get_llm_scheduler():
+    return FairScheduler(LLM_MAX_CONCURRENT)
+
+
+def get_session_id():
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+
+@contextmanager
+def llm_slot(placeholder):
+    # ждем своей очереди к модели; при уходе пользователя или новом запросе
+    # Streamlit прерывает скрипт на ближайшем вызове st.*, и слот освобождается в finally
+    scheduler = get_llm_scheduler()
+    ticket = scheduler.submit(get_session_id())
     try:
-        client = OpenAI(base_url=LLM_URL, api_key="not_needed")
-        stream = client.chat.completions.create(
+        while not scheduler.wait(ticket, timeout=0.5):
+            placeholder.info(f"Модель занята другими пользователями, ваш запрос {scheduler.position(ticket)}-й в очереди")
+        placeholder.empty()
+        yield ticket
+    finally:
+        scheduler.release(ticket)
+
+
+def generate_response(question, schema_context):
+    try:
+        stream = get_llm_client().chat.completions.create(
             model="local-model",
-            messages=[{"role": "user", "content": prompt}],
+            messages=build_messages(question, schema_context),
             temperature=0.8,
             max_tokens=5000,
-            stream=True
+            stream=True,
+            # последний кусок потока приносит usage с числом токенов промпта
+            stream_options={"include_usage": True}
         )
 
         return stream  # возвращаем генератор для стриминга
@@ -148,21 +231,94 @@ def generate_response(question):
         return None
 
 
+@st.cache_resource
+def get_sql_executor():
+    # запросы из чата выполняются в фоне, пока модель дописывает ответ
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="sql")
+
+
+def fetch_sql_result(sql):
+    # без вызовов st.*: функция работает в фоновом потоке без контекста Streamlit
+    cache_key = query_cache.result_key(sql)
+    df = query_cache.results.get(cache_key)
+    if df is not None:
+        return df
+
+    # до выполнения: только чтение и оценка плана в пределах лимитов, иначе QueryRejected
+    if QUERY_BACKEND == "duckdb":
+        admit_query(duckdb_conn, sql, explain=duckdb_backend.explain_estimate)
+        df, truncated_by = duckdb_backend.run_limited(duckdb_conn, sql)
+    else:
+        admit_query(engine, sql)
+        df, truncated_by = run_limited(engine, sql)
+    df.attrs['truncated_by'] = truncated_by
+    # обрезка по времени зависит от нагрузки на базу: в следующий раз запрос может успеть целиком
+    if truncated_by != 'time':
+        query_cache.results.put(cache_key, df)
+    return df
+
+
 def execute_sql(sql):
+    return wait_sql_result(get_sql_executor().submit(fetch_sql_result, sql))
+
+
+def wait_sql_result(future):
+    # QueryRejected обрабатывает вызывающий код: запрос можно попросить переписать
     try:
-        with engine.connect() as conn:
-            df = pd.read_sql(text(sql), conn)
-            return df
+        return future.result()
+    except QueryRejected:
+        raise
+    except (QueryCanceled, TimeoutError):
+        st.error(f"Запрос выполнялся дольше {SQL_TIMEOUT_MS / 1000:g} с и был остановлен")
+        return None
     except Exception as e:
         st.error(f"Ошибка выполнения SQL:\n{str(e)}")
         return None
 
 
+def rewrite_rejected_sql(question, schema_context, sql, error):
+    # одна попытка: модель получает причину отказа и пишет запрос заново
+    st.warning(f"Запрос не допущен к выполнению: {error.reason}. Просим модель переписать его...")
+    try:
+        with llm_slot(st.empty()) as ticket:
+            if ticket.cancelled:
+                return None, None
+            completion = get_llm_client().chat.completions.create(
+                model="local-model",
+                messages=build_rewrite_messages(question, schema_context, sql, error.reason),
+                temperature=0.2,
+                max_tokens=1000,
+            )
+    except Exception as e:
+        st.error(f"Ошибка соединения с LLM: {str(e)}")
+        return None, None
+
+    import re
+    sql_match = re.search(r'```sql\s*(.*?)\s*```', completion.choices[0].message.content or "",
+                          re.DOTALL | re.IGNORECASE)
+    if not sql_match:
+        st.error("Модель не предложила другой запрос")
+        return None, None
+
+    new_sql = sql_match.group(1).strip()
+    try:
+        return new_sql, execute_sql(new_sql)
+    except QueryRejected as e:
+        st.error(f"Переписанный запрос тоже не допущен: {e.reason}")
+        return None, None
+
+
 def display_table(df):
     if df.empty:
         st.info("Запрос выполнен, но данные не найдены")
     else:
-        st.success(f"Найдено строк: {len(df):,}")
+        truncated_by = df.attrs.get('truncated_by')
+        if truncated_by == 'rows':
+            st.warning(f"Результат обрезан: показаны первые {len(df):,} строк (лимит {SQL_MAX_ROWS:,})")
+        elif truncated_by == 'time':
+            st.warning(f"Результат обрезан по времени: получено {len(df):,} строк за {SQL_TIMEOUT_MS / 1000:g} с")
+        else:
+            st.success(f"Найдено строк: {len(df):,}")
         st.dataframe(df.head(1000))
 
 
@@ -177,6 +333,11 @@ def display_plot(df, plot_params):
         if isinstance(y, str) and ',' in y:
             y = [col.strip() for col in y.split(',')]
 
+        plot_df = downsample_for_plot(df, plot_type, x, y, color)
+        if len(plot_df) < len(df):
+            st.caption(f"На графике {len(plot_df):,} из {len(df):,} точек")
+        df = plot_df
+
         if plot_type == 'bar':
             fig = px.bar(df, x=x, y=y, color=color, title=title)
         elif plot_type == 'line':
@@ -227,6 +388,8 @@ if "page" not in st.session_state:
 if st.session_state["page"] == "upload":
     st.header("Загрузка данных в базу")
     st.markdown("Загружайте CSV-файлы с котировками акций за 2025 год")
+    if QUERY_BACKEND == "duckdb":
+        st.info("Чат работает на DuckDB и читает файлы из datasets напрямую, загрузка в PostgreSQL для него не нужна")
 
     try:
         with engine.connect():
@@ -272,6 +435,25 @@ if st.session_state["page"] == "upload":
                     if_exists=if_exists_map[mode]
                 )
 
+    st.subheader("Загрузить папку на сервере")
+    directory = st.text_input("Папка с CSV-файлами", value=str(DATASETS_ROOT),
+                              help=f"Только {DATASETS_ROOT} и ее подпапки")
+    if st.button("Загрузить папку"):
+        upload_directory(directory)
+
+    st.subheader("Общая таблица котировок")
+    st.markdown(f"Файлы котировок загружаются в одну таблицу `{PRICES_TABLE}`: "
+                "тикер берется из имени файла, дата хранится как DATE")
+    price_files = st.file_uploader("Файлы котировок", type=["csv"], accept_multiple_files=True)
+    if price_files:
+        layout = st.radio("Индексы", LAYOUTS, horizontal=True,
+                          help="btree - ключ (ticker, date); brin - плюс BRIN по дате; "
+                               "partitioned - секция на каждый тикер")
+        prices_mode = st.radio("Если таблица уже есть:", ["append (заменить тикеры)", "replace (пересоздать)"],
+                               horizontal=True)
+        if st.button("Загрузить в prices", type="primary"):
+            upload_prices(price_files, layout, prices_mode.split()[0])
+
 elif st.session_state["page"] == "chat":
     st.header("Чат-ассистент по акциям 2025 года")
     st.caption("Задавайте вопросы на естественном языке — строим графики, считаем статистику, сравниваем акции")
@@ -287,6 +469,8 @@ elif st.session_state["page"] == "chat":
                 st.markdown(message["content"])
 
     if prompt := st.chat_input("Спросите про акции, постройте график, сравните компании..."):
+        # новый вопрос отменяет генерацию по прошлому, если она еще идет
+        get_llm_scheduler().cancel_session(get_session_id())
         st.session_state.messages.append({"role": "user", "content": prompt})
 
         with chat_container:
@@ -296,18 +480,60 @@ elif st.session_state["page"] == "chat":
         with chat_container:
             with st.chat_message("assistant"):
                 message_placeholder = st.empty()
-                full_response = ""
 
-                stream = generate_response(prompt)
-
-                if stream:
+                schema_context = build_schema_context(
+                    get_database_schema(), prompt,
+                    dialect="DuckDB, синтаксис как в PostgreSQL" if QUERY_BACKEND == "duckdb" else "PostgreSQL")
+                response_key = query_cache.response_key(prompt, schema_context)
+                full_response = query_cache.responses.get(response_key)
+                from_cache = full_response is not None
+                stream = None
+                sql_future = None
+
+                if not from_cache:
+                    ticket_start = time.perf_counter()
+                    with llm_slot(message_placeholder) as ticket:
+                        request_start = time.perf_counter()
+                        queue_time = request_start - ticket_start
+                        stream = None if ticket.cancelled else generate_response(prompt, schema_context)
+                        if stream:
+                            try:
+                                full_response = ""
+                                first_token_time = None
+                                prompt_tokens = None
+                                sql_detector = SqlFenceDetector()
+                                for chunk in stream:
+                                    if ticket.cancelled:
+                                        raise RuntimeError("генерация отменена новым запросом")
+                                    if chunk.usage is not None:
+                                        prompt_tokens = chunk.usage.prompt_tokens
+                                    if chunk.choices and chunk.choices[0].delta.content is not None:
+                                        if first_token_time is None:
+                                            first_token_time = time.perf_counter() - request_start
+                                        delta = chunk.choices[0].delta.content
+                                        full_response += delta
+                                        message_placeholder.markdown(full_response + "▌")
+                                        # SQL уходит в базу сразу после закрытия блока, пока идет комментарий
+                                        if sql_detector.feed(delta):
+                                            sql_future = get_sql_executor().submit(fetch_sql_result,
+                                                                                   sql_detector.sql)
+                                query_cache.responses.put(response_key, full_response)
+                                if first_token_time is not None:
+                                    st.caption(f"Первый токен через {first_token_time:.2f} с"
+                                               + (f", токенов в промпте: {prompt_tokens:,}" if prompt_tokens else "")
+                                               + (f", в очереди {queue_time:.1f} с" if queue_time >= 0.1 else ""))
+                            except Exception as e:
+                                message_placeholder.error(f"Ошибка обработки ответа: {str(e)}")
+                                full_response = None
+                            finally:
+                                # закрытое соединение останавливает генерацию на сервере модели
+                                stream.close()
+
+                if full_response is not None:
                     try:
-                        for chunk in stream:
-                            if chunk.choices[0].delta.content is not None:
-                                full_response += chunk.choices[0].delta.content
-                                message_placeholder.markdown(full_response + "▌")
-
                         message_placeholder.markdown(full_response)
+                        if from_cache:
+                            st.caption("Ответ из кэша")
 
                         import re
 
@@ -320,7 +546,18 @@ elif st.session_state["page"] == "chat":
                             full_response = re.sub(r'```sql\s*(.*?)\s*```', '', full_response,
                                                    flags=re.DOTALL | re.IGNORECASE).strip()
 
-                            df = execute_sql(sql_query)
+                            if sql_future is None:
+                                sql_future = get_sql_executor().submit(fetch_sql_result, sql_query)
+                            try:
+                                df = wait_sql_result(sql_future)
+                            except QueryRejected as e:
+                                new_sql, df = rewrite_rejected_sql(prompt, schema_context, sql_query, e)
+                                if new_sql is not None:
+                                    st.caption("Запрос переписан моделью после проверки плана")
+                                    # в кэше ответов остается уже исправленный запрос
+                                    cached = query_cache.responses.get(response_key)
+                                    if cached is not None:
+                                        query_cache.responses.put(response_key, cached.replace(sql_query, new_sql))
 
                         plot_match = re.search(r'(?:```plot|plot)\s+(.+?)(?:\s*```|$)', full_response,
                                                re.DOTALL | re.IGNORECASE | re.MULTILINE)
@@ -351,5 +588,5 @@ elif st.session_state["page"] == "chat":
 
                     except Exception as e:
                         message_placeholder.error(f"Ошибка обработки ответа: {str(e)}")
-                else:
+                elif not stream:
                     message_placeholder.warning("Не удалось получить ответ от модели.")
\ No newline at end of file
@@ -0,0 +1,85 @@
+import argparse
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+import duckdb_backend
+from bulk_ingest import ingest_directory
+from bulk_load import db_url_from_env
+from prices import load_prices, read_price_dir
+from sql_runner import run_limited
+
+# Типичные запросы ассистента на обоих бэкендах: PostgreSQL (таблицы загружены
+# через приложение или bulk_ingest/prices) и встроенный DuckDB над Parquet.
+# Время - медиана по нескольким повторам, вместе с получением результата в DataFrame.
+# Подготовка DuckDB (CSV -> Parquet и представления) измеряется с нуля во временной папке;
+# с --ingest так же измеряется загрузка datasets в Postgres.
+# Запуск: python benchmark_backends.py --repeat 20 [--ingest]
+
+QUERIES = {
+    "цена за месяц": """
+        SELECT date, ticker, close FROM prices
+        WHERE ticker IN ('amazon', 'apple') AND date >= (SELECT max(date) FROM prices) - INTERVAL '30 days'
+        ORDER BY ticker, date""",
+    "макс. объем": "SELECT max(volume) AS max_volume FROM tesla",
+    "среднее по месяцам": """
+        SELECT ticker, date_trunc('month', date) AS month, avg(close) AS avg_close
+        FROM prices GROUP BY ticker, month ORDER BY ticker, month""",
+    "JOIN компаний": """
+        SELECT a.date::date AS date, a.close AS close_amzn, p.close AS close_aapl
+        FROM amazon a JOIN apple p ON a.date = p.date ORDER BY a.date::date""",
+    "доходность (окно)": """
+        SELECT ticker, date, close / lag(close) OVER (PARTITION BY ticker ORDER BY date) - 1 AS daily_return
+        FROM prices ORDER BY ticker, date""",
+    "корреляция": """
+        SELECT corr(a.close, b.close) AS corr FROM prices a JOIN prices b ON a.date = b.date
+        WHERE a.ticker = 'nvidia' AND b.ticker = 'microsoft'""",
+    "сводка по тикерам": """
+        SELECT ticker, min(low) AS min_low, max(high) AS max_high, sum(volume) AS total_volume,
+               stddev(close) AS volatility
+        FROM prices GROUP BY ticker ORDER BY volatility DESC""",
+}
+
+
+def median_time(run, sql, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df, _ = run(sql)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assistant queries: PostgreSQL vs embedded DuckDB over Parquet")
+    parser.add_argument("--dir", default=duckdb_backend.DATASETS_DIR)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--ingest", action="store_true", help="сначала загрузить datasets в Postgres и замерить")
+    args = parser.parse_args()
+
+    engine = create_engine(db_url_from_env())
+    if args.ingest:
+        start = time.perf_counter()
+        ingest_directory(engine, args.dir)
+        load_prices(engine, read_price_dir(args.dir))
+        print(f"Postgres: загрузка datasets {time.perf_counter() - start:.2f} с")
+
+    with tempfile.TemporaryDirectory() as parquet_dir:
+        start = time.perf_counter()
+        conn = duckdb_backend.connect(args.dir, parquet_dir)
+        print(f"DuckDB: CSV -> Parquet и представления {time.perf_counter() - start:.2f} с")
+
+        print(f"\n{'запрос':>20} {'строк':>7} {'Postgres, мс':>13} {'DuckDB, мс':>11} {'ускорение':>10}")
+        for name, sql in QUERIES.items():
+            pg_time, pg_rows = median_time(lambda q: run_limited(engine, q), sql, args.repeat)
+            duck_time, duck_rows = median_time(lambda q: duckdb_backend.run_limited(conn, q), sql, args.repeat)
+            rows = pg_rows if pg_rows == duck_rows else f"{pg_rows}/{duck_rows}"
+            print(f"{name:>20} {rows:>7} {pg_time * 1000:>13.2f} {duck_time * 1000:>11.2f} "
+                  f"{pg_time / duck_time:>9.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import os
+import time
+
+from openai import OpenAI
+from sqlalchemy import create_engine
+
+from bulk_load import db_url_from_env
+from prompts import SYSTEM_PROMPT, build_messages
+from schema_context import load_schema, format_full_schema, build_schema_context
+
+# Токены промпта и время до первого токена (TTFT): прежний промпт с полной
+# схемой внутри против статического system-промпта и компактного контекста.
+# Новый промпт отправляется дважды: второй раз сервер может взять статическую
+# часть из prefix cache.
+# Запуск: python benchmark_prompt.py --llm-url http://localhost:1234/v1
+
+QUESTIONS = [
+    "Построй график цены закрытия Amazon и Apple за последний месяц",
+    "Какой максимальный объем торгов у Теслы?",
+    "Сравни среднюю цену закрытия Nvidia, Microsoft и Google по месяцам",
+    "Сколько строк в таблице trade_data?",
+]
+
+# промпт в том виде, в каком он собирался до компактного контекста
+OLD_PROMPT_TEMPLATE = """Ты эксперт по анализу финансовых данных акций и SQL/Plotly в Streamlit.
+
+    Схема базы данных (используй ТОЛЬКО эти таблицы и колонки!):
+    {schema}
+
+    {rules}
+    Текущий запрос пользователя: {question}
+    """
+
+
+def old_messages(question, schema):
+    rules = SYSTEM_PROMPT.split("\n", 2)[2]
+    return [{"role": "user", "content": OLD_PROMPT_TEMPLATE.format(schema=format_full_schema(schema),
+                                                                    rules=rules, question=question)}]
+
+
+def measure(client, messages):
+    start = time.perf_counter()
+    stream = client.chat.completions.create(model="local-model", messages=messages, temperature=0,
+                                            max_tokens=1, stream=True, stream_options={"include_usage": True})
+    ttft = None
+    prompt_tokens = None
+    for chunk in stream:
+        if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+            ttft = time.perf_counter() - start
+        if chunk.usage is not None:
+            prompt_tokens = chunk.usage.prompt_tokens
+    if ttft is None:
+        ttft = time.perf_counter() - start
+    chars = sum(len(message["content"]) for message in messages)
+    # статический system-промпт сервер может взять из кэша, заново считается только остальное
+    dynamic = sum(len(message["content"]) for message in messages if message["content"] != SYSTEM_PROMPT)
+    return prompt_tokens, chars, dynamic, ttft
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt size and TTFT: full schema vs compact context")
+    parser.add_argument("--llm-url", default=os.getenv("LLM_URL", "http://localhost:1234/v1"))
+    args = parser.parse_args()
+
+    with create_engine(db_url_from_env()).connect() as conn:
+        schema = load_schema(conn)
+    client = OpenAI(base_url=args.llm_url, api_key="not_needed")
+
+    print(f"{'prompt':>14} {'tokens':>8} {'chars':>8} {'dynamic':>8} {'TTFT, s':>8}  question")
+    for question in QUESTIONS:
+        new = build_messages(question, build_schema_context(schema, question))
+        for name, messages in [("old", old_messages(question, schema)), ("new", new), ("new (warm)", new)]:
+            tokens, chars, dynamic, ttft = measure(client, messages)
+            print(f"{name:>14} {tokens if tokens is not None else '-':>8} {chars:>8} {dynamic:>8} "
+                  f"{ttft:>8.2f}  {question}")
+
+
+if __name__ == "__main__":
+    main()
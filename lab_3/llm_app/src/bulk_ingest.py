@@ -0,0 +1,90 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from bulk_load import copy_dataframe, normalize_column_name, db_url_from_env
+from prices import ticker_from_filename
+
+# Загрузка целой папки CSV: файлы разбираются параллельно в процессах,
+# а каждый разобранный файл сразу уходит в COPY на своем соединении из пула,
+# не дожидаясь остальных. Имена таблиц и колонок - по тем же правилам,
+# что и при загрузке одного файла на странице приложения.
+# Приложение передает свои общие пулы parsers/loaders, чтобы не запускать
+# процессы на каждое нажатие кнопки; из командной строки пулы создаются на время загрузки.
+# Запуск: python bulk_ingest.py --dir ../../datasets --workers 4
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+
+
+def parse_csv(path):
+    start = time.perf_counter()
+    df = pd.read_csv(path)
+    df.columns = [normalize_column_name(col) for col in df.columns]
+    return df, time.perf_counter() - start
+
+
+def ingest_directory(engine, directory, workers=None, if_exists="replace", parsers=None, loaders=None):
+    paths = sorted(Path(directory).glob("*.csv"))
+    if not paths:
+        raise FileNotFoundError(f"В папке {directory} нет CSV-файлов")
+    workers = max(1, min(workers or INGEST_WORKERS, len(paths)))
+
+    report = []
+    start = time.perf_counter()
+    # соединений столько же, сколько потоков COPY; у engine их должно хватать (pool_size + max_overflow)
+    with ExitStack() as stack:
+        if parsers is None:
+            parsers = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+        if loaders is None:
+            loaders = stack.enter_context(ThreadPoolExecutor(max_workers=workers))
+        parsing = {parsers.submit(parse_csv, path): path for path in paths}
+        loading = {}
+        for future in as_completed(parsing):
+            path = parsing[future]
+            df, parse_time = future.result()
+            table_name = ticker_from_filename(path.name)
+            loading[loaders.submit(copy_dataframe, df, engine, table_name, if_exists)] = (path, table_name, parse_time)
+
+        for future in as_completed(loading):
+            path, table_name, parse_time = loading[future]
+            row_count, copy_time = future.result()
+            report.append({"file": path.name, "table": table_name, "rows": row_count,
+                           "mb": path.stat().st_size / 2 ** 20, "parse_s": parse_time, "copy_s": copy_time})
+
+    total_time = time.perf_counter() - start
+    report.sort(key=lambda item: item["file"])
+    return report, total_time
+
+
+def print_report(report, total_time):
+    print(f"\n{'file':>28} {'table':>22} {'rows':>10} {'MB':>7} {'parse, s':>9} {'copy, s':>8} {'rows/s':>11}")
+    for item in report:
+        busy = item["parse_s"] + item["copy_s"]
+        print(f"{item['file']:>28} {item['table']:>22} {item['rows']:>10,} {item['mb']:>7.2f} "
+              f"{item['parse_s']:>9.2f} {item['copy_s']:>8.2f} {item['rows'] / max(busy, 1e-9):>11,.0f}")
+
+    rows = sum(item["rows"] for item in report)
+    size = sum(item["mb"] for item in report)
+    print(f"\nВсего: {len(report)} файлов, {rows:,} строк, {size:.2f} MB за {total_time:.2f} с "
+          f"({rows / max(total_time, 1e-9):,.0f} строк/с, {size / max(total_time, 1e-9):.2f} MB/с)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load a directory of CSV files via parallel COPY")
+    parser.add_argument("--dir", default=os.path.join(os.path.dirname(__file__), "..", "..", "datasets"))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--if-exists", choices=("replace", "append", "fail"), default="replace")
+    args = parser.parse_args()
+
+    report, total_time = ingest_directory(create_engine(db_url_from_env()), args.dir, args.workers, args.if_exists)
+    print_report(report, total_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import io
+import os
+import time
+
+from dotenv import load_dotenv
+
+# Быстрая загрузка DataFrame в PostgreSQL через COPY вместо to_sql(method='multi').
+# Таблица создается/заменяется через to_sql на пустом фрейме, строки идут
+# кусками через copy_expert, все в одной транзакции.
+
+
+def db_url_from_env():
+    # те же переменные окружения, что и у app.py, для запуска загрузок из командной строки
+    load_dotenv()
+    return (f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+            f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}")
+
+
+def normalize_column_name(name):
+    return str(name).strip().lower().replace(" ", "_").replace("-", "_").replace("__", "_")
+
+
+def quote_ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def copy_rows(conn, df, table_name, chunk_rows=50_000):
+    # COPY в уже открытой транзакции conn: вызывающий код может объединить его с DDL/DELETE
+    columns = ", ".join(quote_ident(col) for col in df.columns)
+    copy_sql = f"COPY {quote_ident(table_name)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '')"
+    cursor = conn.connection.cursor()
+    try:
+        for offset in range(0, len(df), chunk_rows):
+            buffer = io.StringIO()
+            df.iloc[offset:offset + chunk_rows].to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+    finally:
+        cursor.close()
+
+
+def report_speed(label, rows, start):
+    elapsed = time.perf_counter() - start
+    rows_per_sec = rows / elapsed if elapsed > 0 else float('inf')
+    print(f"{label}: {rows} строк за {elapsed:.2f} с ({rows_per_sec:,.0f} строк/с)")
+    return elapsed
+
+
+def copy_dataframe(df, engine, table_name, if_exists='append', dtype=None, chunk_rows=50_000):
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        # создаем таблицу с нужными типами, если ее нет (или заменяем при replace)
+        df.head(0).to_sql(table_name, conn, if_exists=if_exists, index=False, dtype=dtype)
+        copy_rows(conn, df, table_name, chunk_rows)
+
+    elapsed = report_speed(f"COPY {table_name}", len(df), start)
+    return len(df), elapsed
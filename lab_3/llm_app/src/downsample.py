@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+# Прореживание данных перед построением графика: браузеру не нужны
+# сотни тысяч точек. Для линий - LTTB (Largest Triangle Three Buckets),
+# он сохраняет форму ряда и пики; для точечных графиков - равномерная выборка.
+
+PLOT_MAX_POINTS = 2_000
+
+
+def axis_values(values: pd.Series) -> np.ndarray:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('int64').to_numpy(dtype=np.float64)
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.notna().all():
+        return numeric.to_numpy(dtype=np.float64)
+    dates = pd.to_datetime(values, errors='coerce')
+    if dates.notna().all():
+        return dates.astype('int64').to_numpy(dtype=np.float64)
+    # категориальная ось - берем порядковый номер строки
+    return np.arange(len(values), dtype=np.float64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # первая и последняя точки остаются, остальные делятся на threshold - 2 корзины
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        # вершина треугольника в следующей корзине - ее среднее
+        next_x = x[stop:next_stop].mean() if next_stop > stop else x[-1]
+        next_y = y[stop:next_stop].mean() if next_stop > stop else y[-1]
+        area = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous]) -
+                      (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_line(df: pd.DataFrame, x: str, y_columns: list[str], max_points: int) -> pd.DataFrame:
+    if len(df) <= max_points:
+        return df
+    df = df.sort_values(x, kind='stable') if x in df.columns else df
+    x_values = axis_values(df[x]) if x in df.columns else np.arange(len(df), dtype=np.float64)
+
+    keep = set()
+    # точки, важные хотя бы для одного ряда, оставляем для всех, чтобы ряды были выровнены
+    per_series = max(3, max_points // max(1, len(y_columns)))
+    for column in y_columns:
+        y_values = pd.to_numeric(df[column], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        keep.update(lttb_indices(x_values, y_values, per_series).tolist())
+    return df.iloc[sorted(keep)]
+
+
+def downsample_for_plot(df: pd.DataFrame, plot_type: str, x: str, y, color: str = None,
+                        max_points: int = PLOT_MAX_POINTS) -> pd.DataFrame:
+    if len(df) <= max_points:
+        return df
+
+    y_columns = [col for col in (y if isinstance(y, list) else [y]) if col in df.columns]
+    if plot_type == 'line' and y_columns:
+        if color and color in df.columns:
+            groups = [group for _, group in df.groupby(color, sort=False)]
+            per_group = max(3, max_points // max(1, len(groups)))
+            return pd.concat([downsample_line(group, x, y_columns, per_group) for group in groups])
+        return downsample_line(df, x, y_columns, max_points)
+    if plot_type == 'scatter':
+        return df.sample(max_points, random_state=0).sort_index()
+    # гистограмма сама агрегирует данные, столбцы не прореживаем
+    return df
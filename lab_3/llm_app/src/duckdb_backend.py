@@ -0,0 +1,169 @@
+import json
+import math
+import os
+import threading
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+from bulk_load import normalize_column_name
+from prices import PRICES_TABLE, PRICE_COLUMNS, ticker_from_filename
+from sql_runner import SQL_MAX_ROWS, SQL_TIMEOUT_MS
+
+# Встроенный DuckDB вместо PostgreSQL: CSV из datasets один раз переводятся в Parquet,
+# поверх файлов создаются представления с теми же именами, что и таблицы в Postgres
+# (amazon, apple, ... и общая prices). prices пишется отдельным файлом, отсортированным
+# по (ticker, date): один файл читается в разы быстрее, чем UNION ALL по всем тикерам.
+# Запросы выполняются векторно в процессе приложения - без сервера, сети и загрузки
+# данных через страницу загрузки.
+# Включается переменной QUERY_BACKEND=duckdb.
+
+DATASETS_DIR = os.getenv("DATASETS_DIR", str(Path(__file__).resolve().parents[2] / "datasets"))
+PARQUET_DIR = os.getenv("DUCKDB_PARQUET_DIR", str(Path(DATASETS_DIR) / "parquet"))
+
+DUCKDB_TYPES = {
+    "DOUBLE": "float8",
+    "FLOAT": "float4",
+    "BIGINT": "int8",
+    "INTEGER": "int4",
+    "SMALLINT": "int2",
+    "VARCHAR": "text",
+    "BOOLEAN": "bool",
+}
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def convert_to_parquet(datasets_dir=DATASETS_DIR, parquet_dir=PARQUET_DIR):
+    # пересобираются только файлы, CSV которых новее Parquet
+    Path(parquet_dir).mkdir(parents=True, exist_ok=True)
+    csv_paths = sorted(Path(datasets_dir).glob("*.csv"))
+    if not csv_paths:
+        raise FileNotFoundError(f"В папке {datasets_dir} нет CSV-файлов")
+
+    conn = duckdb.connect()
+    try:
+        targets = []
+        rebuilt = False
+        for path in csv_paths:
+            target = Path(parquet_dir) / f"{ticker_from_filename(path.name)}.parquet"
+            targets.append(target)
+            if target.exists() and target.stat().st_mtime >= path.stat().st_mtime:
+                continue
+            source = f"read_csv_auto({quote_literal(path)})"
+            columns = [row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+            select = ", ".join(f"{quote_ident(col)} AS {quote_ident(normalize_column_name(col))}" for col in columns)
+            conn.execute(f"COPY (SELECT {select} FROM {source}) TO {quote_literal(target)} (FORMAT parquet)")
+            rebuilt = True
+
+        prices_target = Path(parquet_dir) / f"{PRICES_TABLE}.parquet"
+        if rebuilt or not prices_target.exists():
+            write_prices_parquet(conn, targets, prices_target)
+        if prices_target.exists():
+            targets.append(prices_target)
+    finally:
+        conn.close()
+    return targets
+
+
+def write_prices_parquet(conn, ticker_paths, target):
+    # prices - те же данные в длинном формате, как таблица prices в Postgres
+    columns = ", ".join(quote_ident(col) for col in PRICE_COLUMNS[1:])
+    selects = []
+    for path in ticker_paths:
+        source = f"read_parquet({quote_literal(path)})"
+        names = {row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()}
+        if set(PRICE_COLUMNS[1:]) <= names:
+            selects.append(f"SELECT {quote_literal(path.stem)} AS ticker, {columns} FROM {source}")
+    if selects:
+        conn.execute(f"COPY ({' UNION ALL '.join(selects)} ORDER BY ticker, date) "
+                     f"TO {quote_literal(target)} (FORMAT parquet)")
+
+
+def connect(datasets_dir=DATASETS_DIR, parquet_dir=PARQUET_DIR):
+    conn = duckdb.connect()
+    for path in convert_to_parquet(datasets_dir, parquet_dir):
+        conn.execute(f"CREATE VIEW {quote_ident(path.stem)} AS SELECT * FROM read_parquet({quote_literal(path)})")
+
+    # сгенерированный SQL может читать только файлы представлений
+    conn.execute(f"SET allowed_directories = [{quote_literal(Path(parquet_dir).resolve())}]")
+    conn.execute("SET enable_external_access = false")
+    return conn
+
+
+def load_schema(conn):
+    # тот же вид, что и schema_context.load_schema для Postgres
+    cursor = conn.cursor()
+    rows = cursor.execute("""
+        SELECT table_name, column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = 'main'
+        ORDER BY table_name, ordinal_position
+    """).fetchall()
+    tables = {}
+    for table, column, data_type in rows:
+        tables.setdefault(table, []).append((column, DUCKDB_TYPES.get(data_type, data_type.lower())))
+
+    prices = None
+    if PRICES_TABLE in tables:
+        tickers, first_date, last_date = cursor.execute(f"""
+            SELECT list(DISTINCT ticker ORDER BY ticker), min(date), max(date) FROM {PRICES_TABLE}
+        """).fetchone()
+        prices = {"tickers": tickers or [], "first_date": first_date, "last_date": last_date}
+    return {"tables": tables, "prices": prices}
+
+
+def estimate_nodes(node):
+    # (оценка строк, имя) для узла и всех его потомков. У CROSS_PRODUCT и части
+    # соединений DuckDB не пишет оценку - для них это произведение оценок детей,
+    # для остальных узлов без оценки - наибольшая из оценок детей
+    children = [list(estimate_nodes(child)) for child in node.get("children", [])]
+    for estimates in children:
+        yield from estimates
+    child_rows = [estimates[-1][0] for estimates in children]
+
+    rows = node.get("extra_info", {}).get("Estimated Cardinality")
+    if rows is not None:
+        rows = float(rows)
+    elif child_rows and ("CROSS_PRODUCT" in node["name"] or "JOIN" in node["name"]):
+        rows = math.prod(child_rows)
+    else:
+        rows = max(child_rows, default=0.0)
+    yield rows, node["name"]
+
+
+def explain_estimate(conn, sql):
+    # DuckDB не отдает стоимость плана, только оценку числа строк в узлах
+    plan = conn.cursor().execute("EXPLAIN (FORMAT JSON) " + sql.strip().rstrip(";")).fetchall()[0][1]
+    rows, node = max(estimate for root in json.loads(plan) for estimate in estimate_nodes(root))
+    return None, rows, node
+
+
+def run_limited(conn, sql: str, max_rows: int = SQL_MAX_ROWS,
+                timeout_ms: int = SQL_TIMEOUT_MS) -> tuple[pd.DataFrame, str | None]:
+    # аналог sql_runner.run_limited: по таймауту запрос прерывается и поднимается TimeoutError
+    cursor = conn.cursor()
+    timer = threading.Timer(timeout_ms / 1000, cursor.interrupt)
+    timer.start()
+    try:
+        cursor.execute(sql)
+        rows = cursor.fetchmany(max_rows + 1)
+        columns = [col[0] for col in cursor.description]
+    except duckdb.InterruptException:
+        raise TimeoutError(f"Запрос выполнялся дольше {timeout_ms / 1000:g} с") from None
+    finally:
+        timer.cancel()
+        cursor.close()
+
+    truncated_by = None
+    if len(rows) > max_rows:
+        rows = rows[:max_rows]
+        truncated_by = 'rows'
+    return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True), truncated_by
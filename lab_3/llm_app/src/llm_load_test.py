@@ -0,0 +1,136 @@
+import argparse
+import contextlib
+import os
+import statistics
+import threading
+import time
+
+from openai import OpenAI
+
+from llm_scheduler import FairScheduler, LLM_MAX_CONCURRENT
+from mock_llm import serve_mock
+from prompts import build_messages
+
+# Нагрузка на сервер модели от нескольких пользователей сразу: каждая сессия
+# в своем потоке шлет запросы через общий клиент и FairScheduler, как в приложении.
+# С --cancel-after каждая сессия перебивает свой первый запрос вторым,
+# как пользователь, отправивший новый вопрос до конца ответа.
+# Работает и с настоящей моделью, и с любым OpenAI-совместимым сервером;
+# с --mock поднимает встроенный mock_llm и работает без модели и сети.
+# Число одновременных генераций считается на стороне клиента и не должно
+# превышать --max-concurrent, в том числе при отменах.
+# Запуск: python llm_load_test.py --sessions 8 --requests 2 --max-concurrent 1 [--mock]
+
+QUESTION = "Построй график цены закрытия Amazon за последний месяц"
+SCHEMA_CONTEXT = "Схема (PostgreSQL), только нужные таблицы:\nprices(ticker text, date date, close float8)"
+
+
+class InFlight:
+    # сколько генераций идет сейчас и сколько шло одновременно максимум
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.now = 0
+        self.max = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.now += 1
+            self.max = max(self.max, self.now)
+
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.now -= 1
+
+
+def run_request(client, scheduler, session_id, results, cancel_after=None, in_flight=None):
+    ticket = scheduler.submit(session_id)
+    submitted = time.perf_counter()
+    try:
+        scheduler.wait(ticket)
+        started = time.perf_counter()
+        if ticket.cancelled:
+            results.append({"session": session_id, "status": "cancelled", "queue_s": started - submitted})
+            return
+        with in_flight or contextlib.nullcontext():
+            stream = client.chat.completions.create(model="local-model",
+                                                    messages=build_messages(QUESTION, SCHEMA_CONTEXT),
+                                                    temperature=0.8, max_tokens=500, stream=True)
+            first_token = None
+            status = "done"
+            try:
+                for chunk in stream:
+                    if ticket.cancelled:
+                        status = "cancelled"
+                        break
+                    if first_token is None and chunk.choices and chunk.choices[0].delta.content:
+                        first_token = time.perf_counter()
+                        if cancel_after is not None:
+                            threading.Timer(cancel_after,
+                                            lambda: ticket.released or scheduler.cancel_session(session_id)).start()
+            finally:
+                stream.close()
+        finished = time.perf_counter()
+        results.append({"session": session_id, "status": status, "queue_s": started - submitted,
+                        "ttft_s": (first_token or finished) - started, "total_s": finished - submitted})
+    finally:
+        scheduler.release(ticket)
+
+
+def run_session(client, scheduler, session_id, requests, cancel_after, results, in_flight=None):
+    for number in range(requests):
+        # только первый запрос сессии перебивается следующим
+        run_request(client, scheduler, session_id, results, cancel_after if number == 0 else None, in_flight)
+
+
+def run_load(client, scheduler, sessions, requests, cancel_after=None):
+    # возвращает результаты запросов и максимум одновременных генераций
+    results = []
+    in_flight = InFlight()
+    threads = [threading.Thread(target=run_session, args=(client, scheduler, f"s{number}", requests,
+                                                          cancel_after, results, in_flight))
+               for number in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, in_flight.max
+
+
+def summarize(results, elapsed, max_in_flight):
+    print(f"{'status':>10} {'count':>6} {'queue avg':>10} {'queue max':>10} {'TTFT avg':>9} {'total p50':>10} {'total max':>10}")
+    for status in ("done", "cancelled"):
+        items = [item for item in results if item["status"] == status]
+        if not items:
+            continue
+        queue = [item["queue_s"] for item in items]
+        ttft = [item["ttft_s"] for item in items if "ttft_s" in item] or [0.0]
+        total = [item["total_s"] for item in items if "total_s" in item] or [0.0]
+        print(f"{status:>10} {len(items):>6} {statistics.mean(queue):>10.2f} {max(queue):>10.2f} "
+              f"{statistics.mean(ttft):>9.2f} {statistics.median(total):>10.2f} {max(total):>10.2f}")
+    print(f"\nВсего {len(results)} запросов за {elapsed:.2f} с, одновременных генераций до {max_in_flight}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent sessions against the LLM endpoint through FairScheduler")
+    parser.add_argument("--llm-url", default=os.getenv("LLM_URL", "http://localhost:1234/v1"))
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2, help="запросов подряд в каждой сессии")
+    parser.add_argument("--max-concurrent", type=int, default=LLM_MAX_CONCURRENT)
+    parser.add_argument("--cancel-after", type=float, default=None,
+                        help="через сколько секунд после первого токена сессия отменяет свой первый запрос")
+    parser.add_argument("--mock", action="store_true", help="встроенный mock-сервер вместо --llm-url")
+    parser.add_argument("--mock-token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    llm_url = args.llm_url
+    if args.mock:
+        llm_url = serve_mock(token_delay=args.mock_token_delay).url
+    client = OpenAI(base_url=llm_url, api_key="not_needed", timeout=120, max_retries=0)
+    scheduler = FairScheduler(args.max_concurrent)
+    start = time.perf_counter()
+    results, max_in_flight = run_load(client, scheduler, args.sessions, args.requests, args.cancel_after)
+    summarize(results, time.perf_counter() - start, max_in_flight)
+
+
+if __name__ == "__main__":
+    main()
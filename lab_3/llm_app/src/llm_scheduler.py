@@ -0,0 +1,114 @@
+import itertools
+import os
+import threading
+from collections import OrderedDict, deque
+
+# Очередь к локальной модели: одновременно идет не больше max_concurrent генераций,
+# остальные ждут. Сессии обслуживаются по кругу (round-robin), поэтому пользователь
+# с несколькими запросами подряд не задерживает остальных: следующей получает слот
+# та сессия из ожидающих, которую обслуживали давнее всех. Новый запрос сессии
+# отменяет ее прежние - и ожидающие, и уже генерирующиеся.
+
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", 1))
+
+
+class Ticket:
+    _ids = itertools.count()
+
+    def __init__(self, session_id):
+        self.id = next(self._ids)
+        self.session_id = session_id
+        self.granted = False
+        self.cancelled = False
+        self.released = False
+
+
+class FairScheduler:
+    def __init__(self, max_concurrent=LLM_MAX_CONCURRENT):
+        self.max_concurrent = max(1, max_concurrent)
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()  # session_id -> deque[Ticket], порядок - время постановки в очередь
+        self._active = set()
+        self._served = itertools.count()
+        self._last_served = {}  # session_id -> номер последней выдачи слота
+
+    def submit(self, session_id):
+        ticket = Ticket(session_id)
+        with self._cond:
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._dispatch()
+        return ticket
+
+    @staticmethod
+    def _next_session(queues, last_served):
+        # min устойчив: при равенстве раньше та сессия, что раньше встала в очередь
+        return min(queues, key=lambda session_id: last_served.get(session_id, -1))
+
+    def _dispatch(self):
+        while len(self._active) < self.max_concurrent and self._queues:
+            session_id = self._next_session(self._queues, self._last_served)
+            queue = self._queues[session_id]
+            ticket = queue.popleft()
+            if not queue:
+                del self._queues[session_id]
+            self._last_served[session_id] = next(self._served)
+            ticket.granted = True
+            self._active.add(ticket)
+        self._cond.notify_all()
+
+    def wait(self, ticket, timeout=None):
+        # True, когда слот выдан или запрос отменен; False - истек timeout, можно обновить позицию
+        with self._cond:
+            return self._cond.wait_for(lambda: ticket.granted or ticket.cancelled, timeout)
+
+    def position(self, ticket):
+        # номер в очереди с учетом обхода сессий по кругу, 0 - уже выполняется
+        with self._cond:
+            if ticket.granted or ticket.cancelled:
+                return 0
+            # повторяем выбор _dispatch на копии очередей, пока не дойдем до ticket
+            queues = OrderedDict((session_id, deque(queue)) for session_id, queue in self._queues.items())
+            last_served = dict(self._last_served)
+            served = max(last_served.values(), default=0)
+            for position in itertools.count(1):
+                session_id = self._next_session(queues, last_served)
+                if queues[session_id].popleft() is ticket:
+                    return position
+                if not queues[session_id]:
+                    del queues[session_id]
+                last_served[session_id] = served + position
+
+    def release(self, ticket):
+        with self._cond:
+            if ticket.released:
+                return
+            ticket.released = True
+            if ticket in self._active:
+                self._active.discard(ticket)
+            else:
+                self._remove_queued(ticket)
+            self._dispatch()
+
+    def cancel_session(self, session_id):
+        # генерацию останавливает владелец, увидев ticket.cancelled; слот остается занятым,
+        # пока он не закроет поток и не вызовет release(), иначе модель получит лишнюю генерацию.
+        # _last_served не сбрасывается: отмена не должна поднимать сессию в начало очереди
+        with self._cond:
+            cancelled = [ticket for ticket in self._active
+                         if ticket.session_id == session_id and not ticket.cancelled]
+            cancelled += self._queues.pop(session_id, [])
+            for ticket in cancelled:
+                ticket.cancelled = True
+            self._cond.notify_all()
+        return len(cancelled)
+
+    def _remove_queued(self, ticket):
+        queue = self._queues.get(ticket.session_id)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.session_id]
+
+    def stats(self):
+        with self._cond:
+            return {"active": len(self._active), "queued": sum(map(len, self._queues.values()))}
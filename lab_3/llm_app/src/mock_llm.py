@@ -0,0 +1,97 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Минимальный OpenAI-совместимый сервер для проверок без модели:
+# POST /v1/chat/completions отвечает заданным текстом, со stream=True - по токенам
+# в SSE с паузой token_delay между ними. Запросы не разбираются, ответ всегда один.
+# Нужен llm_load_test.py --mock и тестам; можно запустить отдельно и указать LLM_URL.
+# Запуск: python mock_llm.py --port 1234 --token-delay 0.05
+
+DEFAULT_ANSWER = ("```sql\nSELECT date, close FROM prices WHERE ticker = 'amazon' ORDER BY date;\n```\n\n"
+                  "```plot type=line x=date y=close title=Amazon```\n\nГрафик цены закрытия Amazon.")
+TOKEN_CHARS = 8
+
+
+def completion(content):
+    return {"id": "mock", "object": "chat.completion", "created": int(time.time()), "model": "mock",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}}
+
+
+def completion_chunk(content=None):
+    delta = {"content": content} if content is not None else {}
+    return {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": "mock",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None if content is not None else "stop"}]}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        answer = self.server.answer
+        if not request.get("stream"):
+            body = json.dumps(completion(answer), ensure_ascii=False).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for offset in range(0, len(answer), TOKEN_CHARS):
+                time.sleep(self.server.token_delay)
+                self.send_event(completion_chunk(answer[offset:offset + TOKEN_CHARS]))
+            self.send_event(completion_chunk())
+            self.send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # клиент закрыл поток (отмена запроса) - просто перестаем писать
+            self.close_connection = True
+
+    def send_event(self, data):
+        payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+        event = f"data: {payload}\n\n".encode()
+        self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+        self.wfile.flush()
+
+
+def serve_mock(port=0, answer=DEFAULT_ANSWER, token_delay=0.02):
+    # сервер в фоновом потоке; port=0 - любой свободный, адрес в server.url
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+    server.daemon_threads = True
+    server.answer = answer
+    server.token_delay = token_delay
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="пауза между токенами в потоке, с")
+    parser.add_argument("--answer", default=DEFAULT_ANSWER)
+    args = parser.parse_args()
+
+    server = serve_mock(args.port, args.answer, args.token_delay)
+    print(f"Mock LLM: {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
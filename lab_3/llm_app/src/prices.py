@@ -0,0 +1,120 @@
+import argparse
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from bulk_load import copy_rows, normalize_column_name, quote_ident, report_speed, db_url_from_env
+
+# Все датасеты котировок в одной таблице длинного формата:
+# prices(ticker, date DATE, open, high, low, close, volume) с ключом (ticker, date).
+# Сравнение компаний становится одним range scan по индексу вместо JOIN/UNION
+# таблиц компаний с приведением текстовой даты.
+# layout: btree - только первичный ключ; brin - плюс BRIN по date для выборок
+# по периоду сразу по всем тикерам; partitioned - секции по тикеру (LIST).
+# Запуск: python prices.py --dir ../../datasets --layout brin
+
+PRICES_TABLE = "prices"
+PRICE_COLUMNS = ["ticker", "date", "open", "high", "low", "close", "volume"]
+LAYOUTS = ("btree", "brin", "partitioned")
+
+PRICES_DDL = """
+CREATE TABLE {table} (
+    ticker text NOT NULL,
+    date date NOT NULL,
+    open double precision,
+    high double precision,
+    low double precision,
+    close double precision,
+    volume bigint,
+    PRIMARY KEY (ticker, date)
+){partition}
+"""
+
+
+def ticker_from_filename(name):
+    # тот же вид, что и имя таблицы при загрузке отдельного CSV
+    return Path(name).stem.lower().replace(" ", "_").replace("-", "_")
+
+
+def read_price_csv(file, ticker):
+    df = pd.read_csv(file)
+    df.columns = [normalize_column_name(col) for col in df.columns]
+    df["ticker"] = ticker
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    df["volume"] = pd.to_numeric(df["volume"], errors="coerce").round().astype("Int64")
+    return df[PRICE_COLUMNS]
+
+
+def read_price_dir(directory):
+    paths = sorted(Path(directory).glob("*.csv"))
+    if not paths:
+        raise FileNotFoundError(f"В папке {directory} нет CSV-файлов")
+    return pd.concat([read_price_csv(path, ticker_from_filename(path.name)) for path in paths],
+                     ignore_index=True)
+
+
+def create_partitions(conn, tickers):
+    for ticker in tickers:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {quote_ident(f'{PRICES_TABLE}_{ticker}')} "
+                          f"PARTITION OF {quote_ident(PRICES_TABLE)} FOR VALUES IN (:ticker)")
+                     .bindparams(ticker=ticker))
+
+
+def create_prices_table(conn, tickers, layout="btree"):
+    if layout not in LAYOUTS:
+        raise ValueError(f"Неизвестный layout: {layout}, возможные: {', '.join(LAYOUTS)}")
+
+    table = quote_ident(PRICES_TABLE)
+    partition = " PARTITION BY LIST (ticker)" if layout == "partitioned" else ""
+    conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE"))
+    conn.execute(text(PRICES_DDL.format(table=table, partition=partition)))
+
+    if layout == "partitioned":
+        create_partitions(conn, tickers)
+    if layout == "brin":
+        conn.execute(text(f"CREATE INDEX {quote_ident(f'{PRICES_TABLE}_date_brin')} ON {table} USING brin (date)"))
+
+
+def load_prices(engine, df, layout="btree", mode="replace"):
+    # replace - пересоздать таблицу; append - заменить строки только загружаемых тикеров.
+    # Пересоздание/DELETE и COPY идут одной транзакцией: при ошибке остаются прежние
+    # котировки, а запросы ассистента не видят пустую или наполовину загруженную таблицу
+    tickers = sorted(df["ticker"].unique())
+    # сортировка по дате держит BRIN узким: соседние страницы - соседние даты
+    df = df.sort_values(["date", "ticker"], kind="stable")
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        relkind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+                               {"name": PRICES_TABLE}).scalar()
+        if mode == "replace" or relkind is None:
+            create_prices_table(conn, tickers, layout)
+        else:
+            if relkind == "p":
+                # у новых тикеров еще нет своей секции
+                create_partitions(conn, tickers)
+            conn.execute(text(f"DELETE FROM {quote_ident(PRICES_TABLE)} WHERE ticker = ANY(:tickers)"),
+                         {"tickers": tickers})
+        copy_rows(conn, df, PRICES_TABLE)
+
+    elapsed = report_speed(f"COPY {PRICES_TABLE}", len(df), start)
+    with engine.begin() as conn:
+        conn.execute(text(f"ANALYZE {quote_ident(PRICES_TABLE)}"))
+    return len(df), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load all price datasets into one prices table")
+    parser.add_argument("--dir", default=os.path.join(os.path.dirname(__file__), "..", "..", "datasets"))
+    parser.add_argument("--layout", choices=LAYOUTS, default="btree")
+    parser.add_argument("--mode", choices=("replace", "append"), default="replace")
+    args = parser.parse_args()
+
+    load_prices(create_engine(db_url_from_env()), read_price_dir(args.dir), args.layout, args.mode)
+
+
+if __name__ == "__main__":
+    main()
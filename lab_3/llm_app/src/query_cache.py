@@ -0,0 +1,125 @@
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Двухуровневый кэш чат-ассистента:
+# 1) нормализованный вопрос + хэш схемы -> ответ LLM (SQL и параметры графика)
+# 2) нормализованный SQL + версии затронутых таблиц -> DataFrame результата
+# Оба уровня - LRU с лимитом по числу записей и по памяти. Версия таблицы
+# увеличивается при загрузке CSV, поэтому старые результаты больше не совпадают по ключу.
+# Таблицы могут меняться и в обход приложения (bulk_ingest, prices, другие клиенты),
+# поэтому результаты еще и живут не дольше SQL_RESULT_TTL секунд.
+
+SQL_RESULT_TTL = float(os.getenv("SQL_RESULT_TTL", 600))
+
+IDENTIFIER_RE = re.compile(r'"([^"]+)"|\b([a-z_][a-z0-9_$]*)\b', re.IGNORECASE)
+LITERAL_RE = re.compile(r"('(?:[^']|'')*')")
+
+
+class LRUCache:
+    def __init__(self, max_entries: int, max_bytes: int, sizeof, ttl: float | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                self.misses += 1
+                return None
+            value, size, expires = self.items[key]
+            if expires is not None and time.monotonic() >= expires:
+                del self.items[key]
+                self.bytes -= size
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        # значение больше всего лимита не кэшируем, чтобы не вытеснить все остальное
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            if key in self.items:
+                self.bytes -= self.items.pop(key)[1]
+            self.items[key] = (value, size, expires)
+            self.bytes += size
+            while len(self.items) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self.items.popitem(last=False)
+                self.bytes -= evicted_size
+
+    def discard(self, predicate):
+        with self.lock:
+            for key in [key for key in self.items if predicate(key)]:
+                self.bytes -= self.items.pop(key)[1]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.bytes = 0
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r'\s+', ' ', question).strip().rstrip('?!.').strip().lower()
+
+
+def normalize_sql(sql: str) -> str:
+    # пробелы схлопываем только вне строковых литералов, регистр не трогаем
+    parts = LITERAL_RE.split(sql.strip().rstrip(';').strip())
+    return ''.join(part if part.startswith("'") else re.sub(r'\s+', ' ', part) for part in parts)
+
+
+def sql_identifiers(sql: str) -> set[str]:
+    return {(quoted or plain).lower() for quoted, plain in IDENTIFIER_RE.findall(LITERAL_RE.sub("''", sql))}
+
+
+def schema_hash(schema: str) -> str:
+    return hashlib.sha1(schema.encode()).hexdigest()
+
+
+def dataframe_size(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class QueryCache:
+    def __init__(self, max_responses: int = 256, max_results: int = 128, max_result_bytes: int = 256 * 2 ** 20,
+                 result_ttl: float | None = SQL_RESULT_TTL):
+        self.responses = LRUCache(max_responses, 16 * 2 ** 20, sys.getsizeof)
+        self.results = LRUCache(max_results, max_result_bytes, dataframe_size, ttl=result_ttl)
+        self.table_versions = {}
+        self.lock = threading.Lock()
+
+    def response_key(self, question: str, schema: str) -> tuple:
+        return normalize_question(question), schema_hash(schema)
+
+    def result_key(self, sql: str) -> tuple:
+        # в ключ попадают версии только тех перезагруженных таблиц, что упомянуты в запросе;
+        # таблица без версии еще не менялась с запуска приложения
+        identifiers = sql_identifiers(sql)
+        with self.lock:
+            versions = tuple(sorted((table, version) for table, version in self.table_versions.items()
+                                    if table in identifiers))
+        return normalize_sql(sql), versions
+
+    def invalidate_table(self, table_name: str):
+        table_name = table_name.lower()
+        with self.lock:
+            self.table_versions[table_name] = self.table_versions.get(table_name, 0) + 1
+        # результаты со старой версией уже не совпадут по ключу, освобождаем память сразу
+        self.results.discard(lambda key: table_name in sql_identifiers(key[0]))
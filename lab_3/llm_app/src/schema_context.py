@@ -0,0 +1,165 @@
+import re
+
+from sqlalchemy import text
+
+from prices import PRICES_TABLE
+
+# Компактный контекст схемы для промпта: одна строка на таблицу с короткими
+# типами и только те таблицы, что относятся к вопросу. Релевантность - по
+# совпадению слов вопроса с именем таблицы и названиями компаний
+# (по-английски и по-русски, с отброшенными окончаниями). Колонки date, close, ...
+# есть у всех таблиц компаний, поэтому совпадения по колонкам весят мало и выбирают
+# таблицы, только когда ни одна не нашлась по имени.
+
+MAX_CONTEXT_TABLES = 6
+COLUMN_HIT_WEIGHT = 0.1
+
+TYPE_ALIASES = {
+    "double precision": "float8",
+    "bigint": "int8",
+    "integer": "int4",
+    "smallint": "int2",
+    "numeric": "numeric",
+    "character varying": "varchar",
+    "timestamp without time zone": "timestamp",
+    "timestamp with time zone": "timestamptz",
+    "boolean": "bool",
+}
+
+# имена таблиц совпадают с тикерами prices (имя файла датасета)
+COMPANY_ALIASES = {
+    "amazon": ["amazon", "amzn", "амазон"],
+    "apple": ["apple", "aapl", "эппл", "эпл", "апл"],
+    "cocacola": ["coca", "cola", "cocacola", "ko", "кока", "кола"],
+    "google": ["google", "googl", "alphabet", "гугл", "алфавит"],
+    "hdfc_bank": ["hdfc"],
+    "icici_bank": ["icici"],
+    "infosys": ["infosys", "infy", "инфосис"],
+    "meta": ["meta", "facebook", "мета", "фейсбук"],
+    "microsoft": ["microsoft", "msft", "майкрософт", "микрософт"],
+    "nvidia": ["nvidia", "nvda", "нвидиа", "нвидия"],
+    "pepsico": ["pepsico", "pepsi", "пепси", "пепсико"],
+    "reliance_industries": ["reliance", "релайенс"],
+    "tcs": ["tcs", "tata"],
+    "tesla": ["tesla", "tsla", "тесла"],
+    "walmart": ["walmart", "wmt", "волмарт", "уолмарт"],
+}
+
+RUSSIAN_ENDINGS = ("ами", "ями", "ого", "его", "ому", "ему", "ой", "ей", "ом", "ем", "ах", "ях", "ов", "ев",
+                   "а", "я", "ы", "и", "у", "ю", "е", "о", "ь", "й")
+WORD_RE = re.compile(r"[a-zа-яё0-9]+")
+
+
+def stem(word):
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def question_stems(question):
+    return {stem(word) for word in WORD_RE.findall(question.lower().replace("ё", "е"))}
+
+
+def load_schema(conn):
+    rows = conn.execute(text("""
+        SELECT c.table_name, c.column_name, c.data_type, c.character_maximum_length
+        FROM information_schema.columns c
+        WHERE c.table_schema = 'public'
+          AND c.table_name NOT IN ('pg_stat_statements')
+          -- секции prices описываются вместе с родительской таблицей
+          AND c.table_name NOT IN (SELECT relname FROM pg_class WHERE relispartition)
+        ORDER BY c.table_name, c.ordinal_position
+    """))
+    tables = {}
+    for table, column, data_type, max_length in rows:
+        short_type = TYPE_ALIASES.get(data_type, data_type)
+        if max_length is not None:
+            short_type = f"{short_type}({max_length})"
+        tables.setdefault(table, []).append((column, short_type))
+
+    prices = None
+    if PRICES_TABLE in tables:
+        tickers, first_date, last_date = conn.execute(text(f"""
+            SELECT array_agg(DISTINCT ticker ORDER BY ticker), min(date), max(date) FROM {PRICES_TABLE}
+        """)).one()
+        prices = {"tickers": tickers or [], "first_date": first_date, "last_date": last_date}
+    return {"tables": tables, "prices": prices}
+
+
+def format_full_schema(schema):
+    # прежний полный вид схемы, для сравнения размера промпта
+    lines = ["Схема базы данных (PostgreSQL):\n"]
+    for table, columns in schema["tables"].items():
+        lines.append(f"Таблица: {table}")
+        lines.append("    " + ",\n    ".join(f"{column} {column_type}" for column, column_type in columns))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def compact_table(table, columns):
+    return f"{table}(" + ", ".join(f"{column} {column_type}" for column, column_type in columns) + ")"
+
+
+def table_stems(table):
+    words = set(table.lower().split("_")) | {table.lower()}
+    words |= set(COMPANY_ALIASES.get(table, []))
+    return {stem(word) for word in words}
+
+
+def column_stems(columns):
+    return {stem(column.lower()) for column, _ in columns}
+
+
+def mentioned_tickers(stems, tickers):
+    return [ticker for ticker in tickers
+            if {stem(alias) for alias in COMPANY_ALIASES.get(ticker, [ticker])} & stems]
+
+
+def select_tables(schema, question, max_tables=MAX_CONTEXT_TABLES):
+    stems = question_stems(question)
+    tables = schema["tables"]
+    prices = schema["prices"]
+
+    scores = {}
+    column_scores = {}
+    for table, columns in tables.items():
+        if prices and table in prices["tickers"]:
+            # таблицы компаний не нужны, если есть prices с теми же данными
+            continue
+        name_hits = len(table_stems(table) & stems)
+        column_hits = len(column_stems(columns) & stems)
+        if name_hits:
+            # колонки только упорядочивают таблицы, найденные по имени
+            scores[table] = name_hits + COLUMN_HIT_WEIGHT * column_hits
+        elif column_hits:
+            column_scores[table] = COLUMN_HIT_WEIGHT * column_hits
+
+    if prices and mentioned_tickers(stems, prices["tickers"]):
+        scores[PRICES_TABLE] = max(scores.values(), default=0) + 1
+    if not scores:
+        scores = column_scores
+    selected = sorted(scores, key=lambda table: (-scores[table], table))[:max_tables]
+
+    if not selected:
+        # ничего не нашли - даем основную таблицу котировок или все таблицы
+        selected = [PRICES_TABLE] if prices else list(tables)[:max_tables]
+    return selected
+
+
+def build_schema_context(schema, question, max_tables=MAX_CONTEXT_TABLES, dialect="PostgreSQL"):
+    selected = select_tables(schema, question, max_tables)
+    lines = [f"Схема ({dialect}), только нужные таблицы:"]
+    for table in selected:
+        lines.append(compact_table(table, schema["tables"][table]))
+
+    prices = schema["prices"]
+    if PRICES_TABLE in selected:
+        lines.append(f"prices: ticker in ({', '.join(prices['tickers'])}); "
+                     f"даты {prices['first_date']}..{prices['last_date']}; ключ (ticker, date)")
+
+    other = [table for table in schema["tables"] if table not in selected
+             and not (prices and table in prices["tickers"])]
+    if other:
+        lines.append("Другие таблицы: " + ", ".join(other))
+    return "\n".join(lines)
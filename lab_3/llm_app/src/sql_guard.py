@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+# Допуск сгенерированного SQL до выполнения: только один SELECT/WITH без
+# изменения данных, затем EXPLAIN (FORMAT JSON) и сравнение оценки планировщика
+# с порогами. Запрос с перемножением таблиц или оценкой в миллиарды строк
+# отклоняется, не успев нагрузить общую базу. Каждое решение пишется в JSONL-журнал
+# в папке приложения (llm_app/logs), журнал ротируется по размеру.
+
+SQL_MAX_COST = float(os.getenv("SQL_MAX_COST", 1_000_000))
+SQL_MAX_PLAN_ROWS = float(os.getenv("SQL_MAX_PLAN_ROWS", 1_000_000))
+SQL_EXPLAIN_TIMEOUT_MS = 2_000
+SQL_GUARD_LOG = os.getenv("SQL_GUARD_LOG", str(Path(__file__).resolve().parents[1] / "logs" / "sql_guard.jsonl"))
+SQL_GUARD_LOG_BYTES = 10 * 2 ** 20
+SQL_GUARD_LOG_BACKUPS = 3
+
+# строки, идентификаторы в кавычках и комментарии не должны влиять на проверку слов
+LITERAL_RE = re.compile(r"""
+    '(?:[^']|'')*'
+  | "(?:[^"]|"")*"
+  | (\$[A-Za-z_0-9]*\$).*?\1
+  | --[^\n]*
+  | /\*.*?\*/
+""", re.DOTALL | re.VERBOSE)
+FORBIDDEN_WORDS = ("insert", "update", "delete", "merge", "upsert", "drop", "alter", "create", "truncate",
+                   "grant", "revoke", "copy", "call", "do", "vacuum", "analyze", "lock", "set", "reset",
+                   "into", "comment", "refresh", "listen", "notify",
+                   # команды DuckDB
+                   "attach", "detach", "install", "load", "pragma", "export", "import", "checkpoint")
+FORBIDDEN_RE = re.compile(r"\b(" + "|".join(FORBIDDEN_WORDS) + r")\b")
+# функции с побочными эффектами, которые проходят и в SELECT
+FORBIDDEN_FUNCTIONS_RE = re.compile(r"\b(pg_terminate_backend|pg_cancel_backend|pg_reload_conf|set_config|"
+                                    r"setval|nextval|dblink\w*|lo_\w+|pg_read_\w+|pg_advisory\w*)\s*\(")
+FOR_LOCK_RE = re.compile(r"\bfor\s+(update|share|no\s+key|key\s+share)\b")
+
+_log_lock = threading.Lock()
+_decision_loggers = {}
+
+
+class QueryRejected(Exception):
+    def __init__(self, reason, decision):
+        super().__init__(reason)
+        self.reason = reason
+        self.decision = decision
+
+
+def strip_literals(sql):
+    return LITERAL_RE.sub(" ", sql)
+
+
+def read_only_violation(sql):
+    # причина отказа или None, если запрос - одиночный SELECT/WITH без записи
+    bare = strip_literals(sql).lower().strip().rstrip(";").strip()
+    if not bare:
+        return "пустой запрос"
+    if ";" in bare:
+        return "несколько запросов в одном"
+    if not re.match(r"\(*\s*(select|with)\b", bare):
+        return "разрешены только запросы SELECT"
+    if FOR_LOCK_RE.search(bare):
+        return "запрос берет блокировки строк (FOR UPDATE/SHARE)"
+    match = FORBIDDEN_RE.search(bare) or FORBIDDEN_FUNCTIONS_RE.search(bare)
+    if match:
+        return f"запрос изменяет данные или состояние сервера ({match.group(1).upper()})"
+    return None
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child)
+
+
+def explain_estimate(engine, sql, timeout_ms=SQL_EXPLAIN_TIMEOUT_MS):
+    # стоимость всего плана и самый большой по оценке строк узел
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET TRANSACTION READ ONLY")
+            cursor.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql.strip().rstrip(";"))
+            plan = cursor.fetchone()[0]
+    finally:
+        conn.rollback()
+        conn.close()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    widest = max(walk_plan(root), key=lambda node: node["Plan Rows"])
+    return root["Total Cost"], widest["Plan Rows"], widest["Node Type"]
+
+
+def decision_logger(path):
+    # один логгер с ротацией на файл журнала, запись из потоков сериализует сам logging
+    with _log_lock:
+        if path not in _decision_loggers:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=SQL_GUARD_LOG_BYTES, backupCount=SQL_GUARD_LOG_BACKUPS,
+                                          encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger(f"sql_guard.{Path(path).stem}.{len(_decision_loggers)}")
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            _decision_loggers[path] = logger
+        return _decision_loggers[path]
+
+
+def record_decision(decision, path=SQL_GUARD_LOG):
+    if not path:
+        return
+    decision_logger(path).info(json.dumps(decision, ensure_ascii=False, default=str))
+
+
+def admit_query(engine, sql, max_cost=SQL_MAX_COST, max_rows=SQL_MAX_PLAN_ROWS, log_path=SQL_GUARD_LOG,
+                explain=explain_estimate):
+    # возвращает решение с оценкой плана или бросает QueryRejected;
+    # explain(engine, sql) -> (стоимость или None, строк в самом большом узле, тип узла)
+    decision = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "sql": sql, "admitted": False, "reason": None,
+                "cost": None, "rows": None, "node": None, "max_cost": max_cost, "max_rows": max_rows}
+    reason = read_only_violation(sql)
+    if reason is None:
+        cost, rows, node = explain(engine, sql)
+        decision.update(cost=cost, rows=rows, node=node)
+        if cost is not None and cost > max_cost:
+            reason = f"оценка стоимости {cost:,.0f} больше лимита {max_cost:,.0f}"
+        elif rows > max_rows:
+            reason = f"узел {node} по оценке дает {rows:,.0f} строк при лимите {max_rows:,.0f}"
+
+    decision.update(admitted=reason is None, reason=reason)
+    record_decision(decision, log_path)
+    if reason is not None:
+        raise QueryRejected(reason, decision)
+    return decision
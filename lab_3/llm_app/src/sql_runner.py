@@ -0,0 +1,60 @@
+import os
+import time
+import uuid
+
+import pandas as pd
+from psycopg2.errors import QueryCanceled
+
+# Выполнение сгенерированного SQL с ограничениями: statement_timeout на сервере,
+# чтение серверным курсором порциями и остановка на лимите строк.
+# Так запрос с перемножением таблиц не съест память и не будет идти бесконечно.
+
+SQL_TIMEOUT_MS = int(os.getenv("SQL_TIMEOUT_MS", 15_000))
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", 100_000))
+SQL_FETCH_ROWS = 5_000
+
+
+def run_limited(engine, sql: str, max_rows: int = SQL_MAX_ROWS, timeout_ms: int = SQL_TIMEOUT_MS,
+                fetch_rows: int = SQL_FETCH_ROWS) -> tuple[pd.DataFrame, str | None]:
+    # возвращает результат и причину обрезки: None, 'rows' или 'time'
+    conn = engine.raw_connection()
+    truncated_by = None
+    try:
+        with conn.cursor() as cursor:
+            # сгенерированный запрос не может ничего изменить, даже если прошел проверку текста
+            cursor.execute("SET TRANSACTION READ ONLY")
+            # SET LOCAL действует только до конца транзакции и не остается на соединении в пуле
+            cursor.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+
+        deadline = time.monotonic() + timeout_ms / 1000
+        rows = []
+        columns = None
+        with conn.cursor(name=f"llm_{uuid.uuid4().hex}") as cursor:
+            cursor.execute(sql)
+            while len(rows) <= max_rows:
+                try:
+                    batch = cursor.fetchmany(min(fetch_rows, max_rows + 1 - len(rows)))
+                except QueryCanceled:
+                    # statement_timeout сработал на очередном FETCH: уже прочитанное
+                    # возвращаем как обрезанный результат, без строк - это ошибка таймаута
+                    if not rows:
+                        raise
+                    truncated_by = 'time'
+                    break
+                # у серверного курсора description появляется после FETCH и сбрасывается ошибкой
+                columns = columns or [col[0] for col in cursor.description]
+                if not batch:
+                    break
+                rows.extend(batch)
+                # statement_timeout считается на каждый FETCH, общий лимит проверяем сами
+                if time.monotonic() > deadline:
+                    truncated_by = 'time'
+                    break
+
+        if len(rows) > max_rows:
+            rows = rows[:max_rows]
+            truncated_by = 'rows'
+        return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True), truncated_by
+    finally:
+        conn.rollback()
+        conn.close()
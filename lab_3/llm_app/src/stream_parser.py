@@ -0,0 +1,36 @@
+# Разбор ответа LLM по мере поступления токенов: как только блок ```sql закрыт,
+# запрос можно отдавать в базу, не дожидаясь комментария модели после него.
+# Результат совпадает с поиском r'```sql\s*(.*?)\s*```' по полному ответу.
+
+SQL_FENCE = "```sql"
+FENCE = "```"
+
+
+class SqlFenceDetector:
+    def __init__(self):
+        self.text = ""
+        self.sql = None
+        self.sql_start = None
+        self.scan_from = 0
+
+    def feed(self, delta: str) -> str | None:
+        # возвращает SQL один раз - в момент, когда закрылся первый блок ```sql
+        self.text += delta
+        if self.sql is not None:
+            return None
+
+        if self.sql_start is None:
+            position = self.text[self.scan_from:].lower().find(SQL_FENCE)
+            if position < 0:
+                # открывающая метка может прийти частями - оставляем хвост для следующего поиска
+                self.scan_from = max(0, len(self.text) - len(SQL_FENCE) + 1)
+                return None
+            self.sql_start = self.scan_from + position + len(SQL_FENCE)
+            self.scan_from = self.sql_start
+
+        end = self.text.find(FENCE, self.scan_from)
+        if end < 0:
+            self.scan_from = max(self.sql_start, len(self.text) - len(FENCE) + 1)
+            return None
+        self.sql = self.text[self.sql_start:end].strip()
+        return self.sql
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# модули приложения импортируют друг друга как плоские модули из src
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+import duckdb_backend
+from sql_guard import admit_query, QueryRejected
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    datasets = tmp_path_factory.mktemp("datasets")
+    dates = pd.date_range("2025-01-01", periods=250, freq="D")
+    for number, name in enumerate(["Amazon", "Apple", "Tesla", "Google"]):
+        pd.DataFrame({"Date": dates, "Open": 100.0 + number, "High": 110.0, "Low": 90.0,
+                      "Close": 105.0 + number, "Volume": 1_000}).to_csv(datasets / f"{name}.csv", index=False)
+    conn = duckdb_backend.connect(datasets, tmp_path_factory.mktemp("parquet"))
+    yield conn
+    conn.close()
+
+
+def admit(conn, sql):
+    return admit_query(conn, sql, max_rows=1_000_000, log_path=None, explain=duckdb_backend.explain_estimate)
+
+
+def test_cartesian_product_is_rejected(conn):
+    # у CROSS_PRODUCT нет оценки в плане, она считается по детям: 250^4 строк
+    with pytest.raises(QueryRejected) as error:
+        admit(conn, "SELECT * FROM amazon a, apple b, tesla c, google g")
+    assert error.value.decision["rows"] == 250 ** 4
+    assert error.value.decision["node"] == "CROSS_PRODUCT"
+
+
+def test_cross_join_inside_subquery_is_rejected(conn):
+    with pytest.raises(QueryRejected):
+        admit(conn, "SELECT count(*) FROM (SELECT * FROM amazon CROSS JOIN apple CROSS JOIN tesla) t")
+
+
+def test_join_on_key_is_admitted(conn):
+    decision = admit(conn, "SELECT a.date, a.close, b.close FROM amazon a JOIN apple b ON a.date = b.date")
+    assert decision["admitted"] and decision["rows"] <= 250 * 2
+    df, truncated_by = duckdb_backend.run_limited(conn, "SELECT max(close) AS close FROM prices")
+    assert truncated_by is None and df["close"].iloc[0] == 108.0
@@ -0,0 +1,113 @@
+import threading
+
+from openai import OpenAI
+
+from llm_load_test import run_load
+from llm_scheduler import FairScheduler
+from mock_llm import serve_mock
+
+
+def grant_order(scheduler, tickets):
+    # отпускаем выданные слоты по одному и записываем, кому слот достался
+    order = []
+    while len(order) < len(tickets):
+        granted = next(ticket for ticket in tickets if ticket.granted and not ticket.released)
+        order.append(granted)
+        scheduler.release(granted)
+    return order
+
+
+def test_sessions_are_served_round_robin():
+    scheduler = FairScheduler(1)
+    a1, a2, a3 = (scheduler.submit("A") for _ in range(3))
+    b1 = scheduler.submit("B")
+    c1 = scheduler.submit("C")
+    # A не занимает модель всеми тремя запросами подряд: B и C идут между ними
+    assert grant_order(scheduler, [a1, a2, a3, b1, c1]) == [a1, b1, c1, a2, a3]
+
+
+def test_position_matches_dispatch_order():
+    scheduler = FairScheduler(1)
+    a1, a2 = scheduler.submit("A"), scheduler.submit("A")
+    b1 = scheduler.submit("B")
+    c1 = scheduler.submit("C")
+    assert [scheduler.position(ticket) for ticket in (a1, b1, c1, a2)] == [0, 1, 2, 3]
+
+    scheduler.release(a1)
+    assert [scheduler.position(ticket) for ticket in (b1, c1, a2)] == [0, 1, 2]
+
+
+def test_max_concurrent_slots():
+    scheduler = FairScheduler(2)
+    tickets = [scheduler.submit(f"s{number}") for number in range(4)]
+    assert [ticket.granted for ticket in tickets] == [True, True, False, False]
+    assert scheduler.stats() == {"active": 2, "queued": 2}
+
+
+def test_cancel_keeps_slot_until_release():
+    scheduler = FairScheduler(1)
+    a1 = scheduler.submit("A")
+    b1 = scheduler.submit("B")
+    a2 = scheduler.submit("A")
+
+    assert scheduler.cancel_session("A") == 2
+    assert a1.cancelled and a2.cancelled
+    # генерация a1 еще идет, пока владелец не закрыл поток
+    assert not b1.granted
+    assert scheduler.stats() == {"active": 1, "queued": 1}
+
+    scheduler.release(a1)
+    assert b1.granted
+    scheduler.release(a2)
+    assert scheduler.stats() == {"active": 1, "queued": 0}
+
+
+def test_cancel_keeps_fairness_history():
+    scheduler = FairScheduler(1)
+    a1 = scheduler.submit("A")
+    b1 = scheduler.submit("B")
+    scheduler.cancel_session("A")
+    scheduler.release(a1)
+
+    # A только что обслуживали: новый запрос A не обгоняет C, который еще не получал слот
+    a2 = scheduler.submit("A")
+    c1 = scheduler.submit("C")
+    assert grant_order(scheduler, [b1, a2, c1]) == [b1, c1, a2]
+
+
+def test_cancel_wakes_waiting_ticket():
+    scheduler = FairScheduler(1)
+    scheduler.submit("A")
+    b1 = scheduler.submit("B")
+    woke = []
+    waiter = threading.Thread(target=lambda: woke.append(scheduler.wait(b1, timeout=5)))
+    waiter.start()
+    scheduler.cancel_session("B")
+    waiter.join(timeout=5)
+    assert woke == [True] and b1.cancelled and not b1.granted
+
+
+def test_release_is_idempotent():
+    scheduler = FairScheduler(1)
+    a1 = scheduler.submit("A")
+    b1 = scheduler.submit("B")
+    c1 = scheduler.submit("C")
+    scheduler.release(a1)
+    scheduler.release(a1)
+    assert b1.granted and not c1.granted
+
+
+def test_load_against_mock_server():
+    server = serve_mock(token_delay=0.01)
+    try:
+        client = OpenAI(base_url=server.url, api_key="not_needed", timeout=30, max_retries=0)
+        scheduler = FairScheduler(2)
+        results, max_in_flight = run_load(client, scheduler, sessions=5, requests=2, cancel_after=0.02)
+    finally:
+        server.shutdown()
+
+    assert len(results) == 10
+    assert {item["status"] for item in results} == {"done", "cancelled"}
+    # отмененные генерации тоже держат слот до закрытия потока
+    assert max_in_flight <= 2
+    assert scheduler.stats() == {"active": 0, "queued": 0}
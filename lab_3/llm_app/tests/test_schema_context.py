@@ -0,0 +1,36 @@
+from schema_context import COMPANY_ALIASES, build_schema_context, select_tables
+
+PRICE_TABLE_COLUMNS = [("date", "text"), ("close", "float8"), ("high", "float8"), ("low", "float8"),
+                       ("open", "float8"), ("volume", "int8")]
+
+
+def company_schema(with_prices=False):
+    tables = {table: PRICE_TABLE_COLUMNS for table in sorted(COMPANY_ALIASES)}
+    tables["trade_log"] = [("trade_id", "int8"), ("commission", "float8")]
+    prices = None
+    if with_prices:
+        tables["prices"] = [("ticker", "text")] + PRICE_TABLE_COLUMNS
+        prices = {"tickers": sorted(COMPANY_ALIASES), "first_date": "2025-01-01", "last_date": "2025-12-31"}
+    return {"tables": tables, "prices": prices}
+
+
+def test_common_columns_do_not_select_unrelated_companies():
+    # close и date есть у всех таблиц компаний, выбраны должны быть только названные
+    selected = select_tables(company_schema(), "Сравни цену close Теслы и Apple по date")
+    assert selected == ["apple", "tesla"]
+
+
+def test_column_hits_order_name_matches():
+    schema = company_schema()
+    schema["tables"]["tesla_trades"] = [("trade_id", "int8"), ("commission", "float8")]
+    assert select_tables(schema, "комиссия commission по tesla")[0] == "tesla_trades"
+
+
+def test_column_hits_used_when_no_table_is_named():
+    assert select_tables(company_schema(), "средняя commission по сделкам") == ["trade_log"]
+
+
+def test_company_question_goes_to_prices():
+    context = build_schema_context(company_schema(with_prices=True), "close Амазона за март")
+    assert context.splitlines()[1].startswith("prices(")
+    assert "amazon(" not in context
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+import sql_guard
+from sql_guard import admit_query, QueryRejected
+
+
+def fake_explain(rows):
+    return lambda engine, sql: (None, rows, "Seq Scan")
+
+
+def test_decisions_are_logged_as_jsonl(tmp_path):
+    path = tmp_path / "logs" / "guard.jsonl"
+    admit_query(None, "SELECT 1", log_path=str(path), explain=fake_explain(1))
+    with pytest.raises(QueryRejected):
+        admit_query(None, "DELETE FROM prices", log_path=str(path), explain=fake_explain(1))
+
+    decisions = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [decision["admitted"] for decision in decisions] == [True, False]
+    assert decisions[1]["reason"].startswith("разрешены только")
+
+
+def test_log_is_rotated_by_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(sql_guard, "SQL_GUARD_LOG_BYTES", 4_096)
+    monkeypatch.setattr(sql_guard, "SQL_GUARD_LOG_BACKUPS", 2)
+    path = tmp_path / "guard.jsonl"
+    for number in range(200):
+        admit_query(None, f"SELECT {number} AS value", log_path=str(path), explain=fake_explain(1))
+
+    files = sorted(file.name for file in tmp_path.iterdir())
+    assert files == ["guard.jsonl", "guard.jsonl.1", "guard.jsonl.2"]
+    assert all((tmp_path / name).stat().st_size <= 4_096 for name in files)
@@ -0,0 +1,131 @@
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+import requests
+from sqlalchemy import create_engine, text
+
+from main import DB_URL, simple_extract_data, transform_data, load_via_copy
+
+# Загрузка истории бюллетеней СПбМТСБ за период или из папки с .xls.
+# Разбор файлов идет в пуле процессов, загрузка в БД - в основном процессе.
+# Даты, которые уже есть в trade_data, пропускаются, поэтому запуск можно повторять.
+
+BULLETIN_URL = "https://spimex.com/upload/reports/oil_xls/oil_xls_{day:%Y%m%d}162000.xls"
+FILE_DATE_PATTERN = re.compile(r"oil_xls_(\d{8})")
+
+
+def get_loaded_dates(db_url, table_name='trade_data'):
+    engine = create_engine(db_url)
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(text(f'SELECT DISTINCT "Дата" FROM {table_name}'))
+            return {row[0] for row in result}
+    except Exception as e:
+        print(f"Не удалось получить загруженные даты ({e}), загружаем все")
+        return set()
+    finally:
+        engine.dispose()
+
+
+def date_from_filename(file_path):
+    match = FILE_DATE_PATTERN.search(os.path.basename(file_path))
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d").date()
+    return None
+
+
+def fetch_report(day, download_dir):
+    file_path = os.path.join(download_dir, f"oil_xls_{day:%Y%m%d}.xls")
+    if os.path.exists(file_path):
+        return file_path
+
+    response = requests.get(BULLETIN_URL.format(day=day), timeout=60)
+    # в выходные и праздники бюллетеня нет
+    if response.status_code != 200 or not response.content:
+        return None
+
+    with open(file_path, 'wb') as f:
+        f.write(response.content)
+    return file_path
+
+
+def parse_report(file_path):
+    return transform_data(simple_extract_data(file_path))
+
+
+def fetch_and_parse(day, download_dir):
+    file_path = fetch_report(day, download_dir)
+    if file_path is None:
+        return None
+    return parse_report(file_path)
+
+
+def run_backfill(tasks, loaded_dates, db_url, workers):
+    loaded = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(func, *args): args[0] for func, args in tasks}
+
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"Ошибка разбора {source}: {e}")
+                continue
+
+            if data is None or data.empty:
+                print(f"Нет данных: {source}")
+                continue
+
+            trade_date = date.fromisoformat(data['Дата'].iloc[0])
+            if trade_date in loaded_dates:
+                print(f"Пропуск {source}: дата {trade_date} уже загружена")
+                continue
+
+            if load_via_copy(data, db_url, "trade_data"):
+                loaded_dates.add(trade_date)
+                loaded += 1
+
+    print(f"Загружено дней: {loaded}")
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Загрузка истории бюллетеней СПбМТСБ")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--dir", help="папка с .xls файлами")
+    source.add_argument("--start", type=date.fromisoformat, help="начало периода YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today(),
+                        help="конец периода YYYY-MM-DD")
+    parser.add_argument("--download-dir", default="bulletins")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    loaded_dates = get_loaded_dates(DB_URL)
+    print(f"Уже загружено дат: {len(loaded_dates)}")
+
+    tasks = []
+    if args.dir:
+        for name in sorted(os.listdir(args.dir)):
+            if not name.lower().endswith(".xls"):
+                continue
+            if date_from_filename(name) in loaded_dates:
+                continue
+            tasks.append((parse_report, (os.path.join(args.dir, name),)))
+    else:
+        os.makedirs(args.download_dir, exist_ok=True)
+        day = args.start
+        while day <= args.end:
+            if day.weekday() < 5 and day not in loaded_dates:
+                tasks.append((fetch_and_parse, (day, args.download_dir)))
+            day += timedelta(days=1)
+
+    print(f"Файлов к обработке: {len(tasks)}")
+    run_backfill(tasks, loaded_dates, DB_URL, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import time
+
+import pandas as pd
+
+from main import read_report, extract_rows_loop, extract_rows
+
+# Сравнение построчного и векторизованного разбора отчета СПбМТСБ.
+# Лист читается один раз, дальше замеряется только разбор,
+# для больших объемов лист повторяется несколько раз подряд.
+
+
+def best_time(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора xls-отчета")
+    parser.add_argument("--file", default="spimex_file_original.xls")
+    parser.add_argument("--scales", default="1,5,15", help="во сколько раз размножить лист")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    raw = read_report(args.file)
+
+    print(f"{'строк':>8} {'цикл, с':>10} {'маски, с':>10} {'ускорение':>10}")
+    for scale in [int(s) for s in args.scales.split(",")]:
+        df = pd.concat([raw] * scale, ignore_index=True)
+
+        loop_result = extract_rows_loop(df)
+        vector_result = extract_rows(df)
+        pd.testing.assert_frame_equal(loop_result.astype(object), vector_result.astype(object))
+
+        loop_time = best_time(extract_rows_loop, df, args.repeat)
+        vector_time = best_time(extract_rows, df, args.repeat)
+        print(f"{len(df):>8} {loop_time:>10.4f} {vector_time:>10.4f} {loop_time / vector_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
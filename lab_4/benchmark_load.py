@@ -0,0 +1,43 @@
+import argparse
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from main import DB_URL, TRADE_DATA_DTYPES
+from bulk_load import copy_dataframe
+
+# Сравнение to_sql(method='multi') и COPY на Parsed_data.csv.
+# Данные грузятся во временные таблицы, которые удаляются после замера.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк загрузки trade_data")
+    parser.add_argument("--file", default="Parsed_data.csv")
+    parser.add_argument("--scale", type=int, default=1, help="во сколько раз размножить данные")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.file, dtype=str)
+    data = pd.concat([data] * args.scale, ignore_index=True)
+    engine = create_engine(DB_URL)
+
+    try:
+        start = time.perf_counter()
+        data.to_sql("bench_trade_data_multi", engine, if_exists='replace', index=False,
+                    dtype=TRADE_DATA_DTYPES, method='multi')
+        multi_time = time.perf_counter() - start
+        print(f"to_sql multi: {len(data)} строк за {multi_time:.2f} с ({len(data) / multi_time:,.0f} строк/с)")
+
+        _, copy_time = copy_dataframe(data, engine, "bench_trade_data_copy", if_exists='replace',
+                                      dtype=TRADE_DATA_DTYPES)
+        print(f"Ускорение COPY: {multi_time / copy_time:.1f}x")
+
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS bench_trade_data_multi"))
+            conn.execute(text("DROP TABLE IF EXISTS bench_trade_data_copy"))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import io
+import time
+
+from sqlalchemy import text
+
+# Быстрая загрузка DataFrame в PostgreSQL через COPY вместо to_sql(method='multi').
+# Таблица создается/заменяется через to_sql на пустом фрейме, строки идут
+# кусками через copy_expert, все в одной транзакции.
+# Каждая загрузка увеличивает счетчик таблицы в data_versions в той же транзакции -
+# по нему дашборд понимает, что закэшированные результаты устарели.
+
+VERSIONS_TABLE = 'data_versions'
+
+
+def quote_ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def copy_chunks(cursor, df, table_name, chunk_rows):
+    columns = ", ".join(quote_ident(col) for col in df.columns)
+    copy_sql = f"COPY {quote_ident(table_name)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '')"
+
+    for offset in range(0, len(df), chunk_rows):
+        buffer = io.StringIO()
+        df.iloc[offset:offset + chunk_rows].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor.copy_expert(copy_sql, buffer)
+
+
+def bump_data_version(conn, table_name):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (
+            table_name text PRIMARY KEY,
+            version bigint NOT NULL,
+            loaded_at timestamptz NOT NULL DEFAULT now()
+        )
+    """))
+    conn.execute(text(f"""
+        INSERT INTO {VERSIONS_TABLE} (table_name, version) VALUES (:table_name, 1)
+        ON CONFLICT (table_name) DO UPDATE SET version = {VERSIONS_TABLE}.version + 1, loaded_at = now()
+    """), {"table_name": table_name})
+
+
+def report_speed(label, rows, start):
+    elapsed = time.perf_counter() - start
+    rows_per_sec = rows / elapsed if elapsed > 0 else float('inf')
+    print(f"{label}: {rows} строк за {elapsed:.2f} с ({rows_per_sec:,.0f} строк/с)")
+    return elapsed
+
+
+def copy_dataframe(df, engine, table_name, if_exists='append', dtype=None, chunk_rows=50_000):
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        # создаем таблицу с нужными типами, если ее нет (или заменяем при replace)
+        df.head(0).to_sql(table_name, conn, if_exists=if_exists, index=False, dtype=dtype)
+
+        cursor = conn.connection.cursor()
+        try:
+            copy_chunks(cursor, df, table_name, chunk_rows)
+        finally:
+            cursor.close()
+        bump_data_version(conn, table_name)
+
+    elapsed = report_speed(f"COPY {table_name}", len(df), start)
+    return len(df), elapsed
+
+
+def ensure_unique_index(conn, table_name, key_columns):
+    index_name = f"{table_name}_{'_'.join(key_columns)}_key"
+    exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": quote_ident(index_name)}).scalar()
+    if exists:
+        return
+
+    keys = ", ".join(quote_ident(col) for col in key_columns)
+    # перед созданием индекса убираем дубли от прошлых загрузок через append,
+    # оставляя последнюю вставленную строку
+    conn.execute(text(f"""
+        DELETE FROM {quote_ident(table_name)} t
+        USING (
+            SELECT ctid, row_number() OVER (PARTITION BY {keys} ORDER BY ctid DESC) AS rn
+            FROM {quote_ident(table_name)}
+        ) d
+        WHERE t.ctid = d.ctid AND d.rn > 1
+    """))
+    conn.execute(text(f"CREATE UNIQUE INDEX {quote_ident(index_name)} ON {quote_ident(table_name)} ({keys})"))
+
+
+def upsert_dataframe(df, engine, table_name, key_columns, dtype=None, chunk_rows=50_000):
+    # COPY во временную таблицу, затем INSERT ... ON CONFLICT DO UPDATE в основную:
+    # повторная загрузка того же дня обновляет строки и не меняет их количество
+    staging_name = f"{table_name}_staging"
+    columns = ", ".join(quote_ident(col) for col in df.columns)
+    keys = ", ".join(quote_ident(col) for col in key_columns)
+    updates = ", ".join(f"{quote_ident(col)} = EXCLUDED.{quote_ident(col)}"
+                        for col in df.columns if col not in key_columns)
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        df.head(0).to_sql(table_name, conn, if_exists='append', index=False, dtype=dtype)
+        ensure_unique_index(conn, table_name, key_columns)
+
+        conn.execute(text(f"""
+            CREATE TEMP TABLE {quote_ident(staging_name)}
+            (LIKE {quote_ident(table_name)} INCLUDING DEFAULTS) ON COMMIT DROP
+        """))
+
+        cursor = conn.connection.cursor()
+        try:
+            copy_chunks(cursor, df, staging_name, chunk_rows)
+        finally:
+            cursor.close()
+
+        conn.execute(text(f"""
+            INSERT INTO {quote_ident(table_name)} ({columns})
+            SELECT DISTINCT ON ({keys}) {columns} FROM {quote_ident(staging_name)}
+            ORDER BY {keys}
+            ON CONFLICT ({keys}) DO {f'UPDATE SET {updates}' if updates else 'NOTHING'}
+        """))
+        bump_data_version(conn, table_name)
+
+    elapsed = report_speed(f"UPSERT {table_name}", len(df), start)
+    return len(df), elapsed
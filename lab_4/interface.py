@@ -1,8 +1,16 @@
+import threading
+from contextlib import contextmanager
+
 import streamlit as st
 import pandas as pd
-import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from datetime import datetime, timedelta
-import io
+import tempfile
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from bulk_load import VERSIONS_TABLE
 
 st.set_page_config(
     page_title="Данные торгов",
@@ -29,86 +37,327 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# кэш запросов: ключ - нормализованные фильтры и версия данных
+# (последняя "Дата" и счетчик загрузок из data_versions, см. bulk_load.py)
+CACHE_TTL = 600
+CACHE_MAX_ENTRIES = 128
+
+# экспорт читает строки из БД порциями этого размера
+EXPORT_CHUNK_ROWS = 10_000
+
+# предагрегаты, которые ведет загрузчик (см. rollups.py)
+ROLLUP_TABLE = 'trade_data_daily'
+POOL_MAX_CONN = 5
+
+
+class QueryError(Exception):
+    pass
+
+
 @st.cache_resource
-def get_db_connection():
+def get_connection_pool():
+    # ошибка подключения не кэшируется: при следующем обновлении страницы будет новая попытка.
+    # putconn закрывает соединения сверх minconn, поэтому minconn = maxconn: иначе под
+    # нагрузкой соединение открывалось бы и закрывалось на каждый запрос
+    return ThreadedConnectionPool(
+        minconn=POOL_MAX_CONN,
+        maxconn=POOL_MAX_CONN,
+        host=st.secrets["DB_HOST"],
+        port=st.secrets["DB_PORT"],
+        database=st.secrets["DB_NAME"],
+        user=st.secrets["DB_USER"],
+        password=st.secrets["DB_PASSWORD"]
+    )
+
+
+@st.cache_resource
+def get_pool_slots():
+    # ThreadedConnectionPool не ждет свободного соединения, а бросает PoolError,
+    # поэтому сессии сверх maxconn ждут на семафоре
+    return threading.BoundedSemaphore(POOL_MAX_CONN)
+
+
+@contextmanager
+def pooled_connection():
     try:
-        conn = psycopg2.connect(
-            host=st.secrets["DB_HOST"],
-            port=st.secrets["DB_PORT"],
-            database=st.secrets["DB_NAME"],
-            user=st.secrets["DB_USER"],
-            password=st.secrets["DB_PASSWORD"]
-        )
-        return conn
+        pool = get_connection_pool()
     except Exception as e:
-        st.error(f"Ошибка подключения к БД: {e}")
-        return None
-
+        raise QueryError(f"Ошибка подключения к БД: {e}") from e
 
-def load_data_from_db():
-    conn = get_db_connection()
-    if conn:
+    with get_pool_slots():
+        conn = pool.getconn()
         try:
-            query = "SELECT * FROM trade_data ORDER BY \"Дата\" DESC"
-            df = pd.read_sql_query(query, conn)
+            yield conn
+        finally:
+            pool.putconn(conn)
 
-            # Преобразуем дату из типа date в datetime
-            if 'Дата' in df.columns:
-                df['Дата'] = pd.to_datetime(df['Дата']).dt.date
 
-            return df
+def run_query(query, params=None):
+    # ошибка поднимается, а не превращается в пустой DataFrame: st.cache_data не кэширует исключения
+    with pooled_connection() as conn:
+        try:
+            return pd.read_sql_query(query, conn, params=params)
         except Exception as e:
-            st.error(f"Ошибка загрузки данных: {e}")
-            return pd.DataFrame()
-    return pd.DataFrame()
+            conn.rollback()
+            raise QueryError(f"Ошибка загрузки данных: {e}") from e
 
 
-def filter_data(df, filters):
-    filtered_df = df.copy()
+def get_data_version():
+    # max("Дата") берется по индексу и ловит новый день; счетчик загрузок меняется
+    # и при дозагрузке прошлых дней (backfill), и при повторной загрузке дня (upsert)
+    tables = run_query("SELECT to_regclass('trade_data') IS NOT NULL AS has_data, "
+                       "to_regclass(%(versions)s) IS NOT NULL AS has_versions", {'versions': VERSIONS_TABLE})
+    if not tables['has_data'].iloc[0]:
+        return None
 
-    if filters['start_date'] and filters['end_date']:
-        start_date = pd.to_datetime(filters['start_date'])
-        end_date = pd.to_datetime(filters['end_date'])
+    last_date = run_query('SELECT max("Дата") AS last_date FROM trade_data')['last_date'].iloc[0]
+    version = None
+    if tables['has_versions'].iloc[0]:
+        versions = run_query(f"SELECT version FROM {VERSIONS_TABLE} WHERE table_name = 'trade_data'")
+        version = versions['version'].iloc[0] if not versions.empty else None
+    return f"{last_date}:{version}"
+
+
+def table_exists(name):
+    return bool(run_query("SELECT to_regclass(%(name)s) IS NOT NULL AS has_table", {'name': name})['has_table'].iloc[0])
+
+
+def normalize_filters(filters, max_available_price=None):
+    start_date = filters.get('start_date')
+    end_date = filters.get('end_date')
+    min_price = filters.get('min_price') or 0
+    max_price = filters.get('max_price') or 0
+    # граница не меньше максимальной цены в данных ничего не отсекает и не должна уводить сводку с агрегатов
+    if max_available_price is not None and not pd.isna(max_available_price) \
+            and max_price >= float(max_available_price):
+        max_price = 0
+
+    return (
+        ('start_date', start_date if start_date and end_date else None),
+        ('end_date', end_date if start_date and end_date else None),
+        ('selected_instruments', tuple(sorted(filters.get('selected_instruments') or ()))),
+        ('selected_products', tuple(sorted(filters.get('selected_products') or ()))),
+        ('min_price', min_price if min_price > 0 else None),
+        ('max_price', max_price if max_price > 0 and max_price >= min_price else None),
+    )
 
-        filtered_df['Дата_dt'] = pd.to_datetime(filtered_df['Дата'])
 
-        mask = (filtered_df['Дата_dt'] >= start_date) & \
-               (filtered_df['Дата_dt'] <= (end_date + pd.Timedelta(days=1)))
-        filtered_df = filtered_df[mask]
-        filtered_df = filtered_df.drop('Дата_dt', axis=1)  # Удаляем вспомогательную колонку
+def quote_column(name):
+    return '"' + name.replace('"', '""') + '"'
 
-    if filters['selected_instruments']:
-        filtered_df = filtered_df[filtered_df['КодИнструмента'].isin(filters['selected_instruments'])]
 
-    if filters['selected_products']:
-        filtered_df = filtered_df[filtered_df['Товар'].isin(filters['selected_products'])]
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def get_table_columns(data_version):
+    df = run_query("""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'trade_data'
+        ORDER BY ordinal_position
+    """)
+    return df['column_name'].tolist() if not df.empty else []
 
-    if filters['min_price'] is not None:
-        filtered_df = filtered_df[filtered_df['СреднЦена'] >= filters['min_price']]
-    if filters['max_price'] is not None:
-        filtered_df = filtered_df[filtered_df['СреднЦена'] <= filters['max_price']]
 
-    return filtered_df
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def load_filter_options(data_version):
+    instruments = run_query('SELECT DISTINCT "КодИнструмента" FROM trade_data ORDER BY 1')
+    products = run_query('SELECT DISTINCT "Товар" FROM trade_data WHERE "Товар" IS NOT NULL ORDER BY 1')
+    max_price = run_query('SELECT max("СреднЦена") AS max_price FROM trade_data')
+
+    return {
+        'instruments': instruments.iloc[:, 0].tolist() if not instruments.empty else [],
+        'products': products.iloc[:, 0].tolist() if not products.empty else [],
+        'max_price': max_price['max_price'].iloc[0] if not max_price.empty else None,
+    }
 
 
-def export_to_excel(df):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='СПБ_Данные')
-    return output.getvalue()
+def build_where_clause(filter_key):
+    # фильтры превращаются в параметризованный WHERE, чтобы работали индексы
+    filters = dict(filter_key)
+    conditions = []
+    params = {}
+
+    if filters['start_date'] and filters['end_date']:
+        conditions.append('"Дата" BETWEEN %(start_date)s AND %(end_date)s')
+        params['start_date'] = filters['start_date']
+        params['end_date'] = filters['end_date']
+
+    if filters['selected_instruments']:
+        conditions.append('"КодИнструмента" = ANY(%(selected_instruments)s)')
+        params['selected_instruments'] = list(filters['selected_instruments'])
 
+    if filters['selected_products']:
+        conditions.append('"Товар" = ANY(%(selected_products)s)')
+        params['selected_products'] = list(filters['selected_products'])
 
-def export_to_csv(df):
-    return df.to_csv(index=False, encoding='utf-8-sig').encode('utf-8-sig')
+    if filters['min_price'] is not None:
+        conditions.append('"СреднЦена" >= %(min_price)s')
+        params['min_price'] = filters['min_price']
+    if filters['max_price'] is not None:
+        conditions.append('"СреднЦена" <= %(max_price)s')
+        params['max_price'] = filters['max_price']
+
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    return where, params
+
+
+def can_use_rollups(filter_key):
+    # агрегаты ведутся по Дата x Товар x БазисПоставки, фильтры по инструменту
+    # и цене отдельной строки требуют сырых данных. Таблицы агрегатов нет в базах,
+    # загруженных до rollups.py, тогда сводка тоже считается по сырым строкам
+    filters = dict(filter_key)
+    if filters['selected_instruments'] or filters['min_price'] is not None or filters['max_price'] is not None:
+        return False
+    return table_exists(ROLLUP_TABLE)
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def load_summary(filter_key, data_version):
+    where, params = build_where_clause(filter_key)
+    empty_summary = {'total_rows': 0, 'unique_instruments': 0, 'avg_price': None, 'total_volume': None}
+
+    if can_use_rollups(filter_key):
+        totals = run_query(f"""
+            SELECT coalesce(sum("Строк"), 0) AS total_rows,
+                   sum("СреднЦенаСумма") / nullif(sum("СреднЦенаКол"), 0) AS avg_price,
+                   coalesce(sum("ОбъемДоговоровРубСумма"), 0) AS total_volume
+            FROM {ROLLUP_TABLE} {where}
+        """, params)
+        # число уникальных инструментов не складывается по дням, а строка trade_data - это уже
+        # инструмент за день (ключ КодИнструмента x Дата), так что агрегат по дням был бы
+        # размером с саму таблицу. Эта метрика по-прежнему считается по trade_data
+        # и растет с историей; остальные берутся из агрегатов
+        instruments = run_query(f'SELECT count(DISTINCT "КодИнструмента") AS unique_instruments FROM trade_data {where}',
+                                params)
+        if totals.empty or instruments.empty:
+            return empty_summary
+        return {**totals.iloc[0].to_dict(), **instruments.iloc[0].to_dict()}
+
+    query = f"""
+        SELECT count(*) AS total_rows,
+               count(DISTINCT "КодИнструмента") AS unique_instruments,
+               avg("СреднЦена") AS avg_price,
+               coalesce(sum("ОбъемДоговоровРуб"), 0) AS total_volume
+        FROM trade_data {where}
+    """
+    df = run_query(query, params)
+    if df.empty:
+        return empty_summary
+    return df.iloc[0].to_dict()
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def load_page(filter_key, data_version, columns, sort_column, sort_ascending, page_size, page):
+    # сортировка и LIMIT/OFFSET выполняются в PostgreSQL, по сети идет только страница
+    where, params = build_where_clause(filter_key)
+    order = "ASC" if sort_ascending else "DESC"
+    query = f"""
+        SELECT {", ".join(quote_column(col) for col in columns)}
+        FROM trade_data {where}
+        ORDER BY {quote_column(sort_column)} {order} NULLS LAST
+        LIMIT %(limit)s OFFSET %(offset)s
+    """
+    params['limit'] = page_size
+    params['offset'] = (page - 1) * page_size
+
+    df = run_query(query, params)
+
+    # Преобразуем дату из типа date в datetime
+    if 'Дата' in df.columns:
+        df['Дата'] = pd.to_datetime(df['Дата']).dt.date
+
+    return df
+
+
+PARQUET_TYPES = {
+    'character varying': pa.string(),
+    'text': pa.string(),
+    'integer': pa.int64(),
+    'bigint': pa.int64(),
+    'double precision': pa.float64(),
+    'real': pa.float64(),
+    'numeric': pa.float64(),
+    'date': pa.date32(),
+}
+
+
+def iter_filtered_chunks(filter_key, chunk_rows=EXPORT_CHUNK_ROWS):
+    # именованный курсор читает строки на стороне сервера порциями,
+    # в памяти одновременно находится не больше chunk_rows строк
+    where, params = build_where_clause(filter_key)
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor(name='trade_data_export') as cursor:
+                cursor.itersize = chunk_rows
+                cursor.execute(f'SELECT * FROM trade_data {where} ORDER BY "Дата" DESC', params)
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    yield pd.DataFrame(rows, columns=[col[0] for col in cursor.description])
+        finally:
+            conn.rollback()
+
+
+def export_to_excel(filter_key):
+    output = tempfile.TemporaryFile()
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('СПБ_Данные')
+
+    header_written = False
+    for chunk in iter_filtered_chunks(filter_key):
+        if not header_written:
+            sheet.append(list(chunk.columns))
+            header_written = True
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            sheet.append(row)
+
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def export_to_csv(filter_key):
+    output = tempfile.TemporaryFile()
+    output.write('\ufeff'.encode('utf-8'))
+
+    header_written = False
+    for chunk in iter_filtered_chunks(filter_key):
+        output.write(chunk.to_csv(index=False, header=not header_written).encode('utf-8'))
+        header_written = True
+
+    output.seek(0)
+    return output
+
+
+def export_to_parquet(filter_key):
+    column_types = run_query("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'trade_data'
+        ORDER BY ordinal_position
+    """)
+    schema = pa.schema([(row.column_name, PARQUET_TYPES.get(row.data_type, pa.string()))
+                        for row in column_types.itertuples()])
+
+    output = tempfile.TemporaryFile()
+    with pq.ParquetWriter(output, schema, compression='zstd') as writer:
+        for chunk in iter_filtered_chunks(filter_key):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+    output.seek(0)
+    return output
 
 def main():
     # Заголовок
     st.markdown('<h1 class="main-header">📊 Анализ данных торгов</h1>', unsafe_allow_html=True)
 
     with st.spinner('Загрузка данных из базы...'):
-        df = load_data_from_db()
+        data_version = get_data_version()
+        all_columns = get_table_columns(data_version)
+        options = load_filter_options(data_version) if all_columns else None
 
-    if df.empty:
+    if not options or not options['instruments']:
         st.warning("Нет данных для отображения")
         return
 
@@ -133,16 +382,18 @@ def main():
 
         # Фильтр по инструментам
         st.subheader("Инструменты")
-        all_instruments = sorted(df['КодИнструмента'].unique())
+        all_instruments = options['instruments']
+        # без выбора - все инструменты: выбранные инструменты уводят сводку с агрегатов на сырые строки
         selected_instruments = st.multiselect(
             "Выберите инструменты",
             options=all_instruments,
-            default=all_instruments[:5] if len(all_instruments) > 5 else all_instruments
+            default=[],
+            placeholder="Все инструменты"
         )
 
         # Фильтр по типу товара
         st.subheader("Тип товара")
-        all_products = sorted(df['Товар'].unique())
+        all_products = options['products']
         selected_products = st.multiselect(
             "Выберите товары",
             options=all_products,
@@ -160,117 +411,127 @@ def main():
         max_price = st.number_input(
             "Максимальная цена",
             min_value=0.0,
-            value=float(df['СреднЦена'].max()) if not df['СреднЦена'].isnull().all() else 100000.0,
+            value=float(options['max_price']) if not pd.isna(options['max_price']) else 100000.0,
             step=1000.0
         )
 
         apply_filters = st.button("Применить фильтры", type="primary")
 
-    if 'filtered_df' not in st.session_state:
-        st.session_state.filtered_df = df.copy()
+    if 'filters' not in st.session_state:
+        st.session_state.filters = {}
 
     if apply_filters:
-        filtered_df = df.copy()
-
-        # Фильтр по дате
-        if start_date and end_date:
-            start_dt = pd.to_datetime(start_date)
-            end_dt = pd.to_datetime(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-            filtered_df['Дата_temp'] = pd.to_datetime(filtered_df['Дата'])
-            filtered_df = filtered_df[
-                (filtered_df['Дата_temp'] >= start_dt) &
-                (filtered_df['Дата_temp'] <= end_dt)
-                ].drop(columns=['Дата_temp'])
-
-        # Фильтр по инструментам
-        if selected_instruments:
-            filtered_df = filtered_df[filtered_df['КодИнструмента'].isin(selected_instruments)]
-
-        # Фильтр по товарам
-        if selected_products:
-            filtered_df = filtered_df[filtered_df['Товар'].isin(selected_products)]
-
-        # Фильтр по ценам
-        if min_price > 0:
-            filtered_df = filtered_df[filtered_df['СреднЦена'] >= min_price]
-        if max_price > 0 and max_price >= min_price:
-            filtered_df = filtered_df[filtered_df['СреднЦена'] <= max_price]
-
-        st.session_state.filtered_df = filtered_df
-
-    filtered_df = st.session_state.filtered_df
-
-    st.info(f"Найдено записей после фильтров: **{len(filtered_df)}**")
+        st.session_state.filters = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'selected_instruments': selected_instruments,
+            'selected_products': selected_products,
+            'min_price': min_price,
+            'max_price': max_price,
+        }
+        st.session_state.page = 1
+
+    filter_key = normalize_filters(st.session_state.filters, options['max_price'])
+    summary = load_summary(filter_key, data_version)
+    total_rows = int(summary['total_rows'])
+
+    st.info(f"Найдено записей после фильтров: **{total_rows}**")
 
     st.subheader("📈 Статистика")
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Всего записей", len(filtered_df))
+        st.metric("Всего записей", total_rows)
     with col2:
-        st.metric("Уникальных инструментов", filtered_df['КодИнструмента'].nunique())
+        st.metric("Уникальных инструментов", int(summary['unique_instruments']))
     with col3:
-        avg_price = filtered_df['СреднЦена'].mean()
+        avg_price = summary['avg_price']
         st.metric("Средняя цена", f"{avg_price:,.0f} Руб." if not pd.isna(avg_price) else "N/A")
     with col4:
-        total_volume = filtered_df['ОбъемДоговоровРуб'].sum()
+        total_volume = summary['total_volume']
         st.metric("Общий объем", f"{total_volume:,.0f} Руб." if not pd.isna(total_volume) else "N/A")
 
     st.subheader("📋 Данные")
 
     col1, col2 = st.columns([3, 1])
     with col2:
-        all_columns = list(filtered_df.columns)
         default_columns = ['Дата', 'КодИнструмента', 'Товар', 'СреднЦена', 'ОбъемДоговоровРуб']
         visible_columns = st.multiselect(
             "Показать колонки",
             options=all_columns,
-            default=default_columns
+            default=[col for col in default_columns if col in all_columns]
         )
 
-    if visible_columns:
-        display_df = filtered_df[visible_columns]
-    else:
-        display_df = filtered_df
+    if not visible_columns:
+        visible_columns = all_columns
 
     sort_column = st.selectbox(
         "Сортировать по",
-        options=display_df.columns,
+        options=visible_columns,
         index=0
     )
     sort_ascending = st.checkbox("По возрастанию", value=False)
 
-    display_df = display_df.sort_values(by=sort_column, ascending=sort_ascending)
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Строк на странице", options=[50, 100, 500, 1000], index=1)
+    total_pages = max(1, -(-total_rows // page_size))
+    if st.session_state.get('page', 1) > total_pages:
+        st.session_state.page = total_pages
+    with col2:
+        page = st.number_input(
+            "Страница",
+            min_value=1,
+            max_value=total_pages,
+            step=1,
+            key='page'
+        )
+
+    display_df = load_page(filter_key, data_version, tuple(visible_columns), sort_column, sort_ascending, page_size, int(page))
 
     st.dataframe(
         display_df,
         use_container_width=True,
         height=400
     )
+    st.caption(f"Страница {int(page)} из {total_pages}")
 
     st.subheader("📤 Экспорт данных")
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
+    file_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
 
+    # файлы формируются только при нажатии, потоково из БД
     with col1:
-        if st.button("📊 Экспорт в Excel", use_container_width=True):
-            excel_data = export_to_excel(filtered_df)
-            st.download_button(
-                label="⬇️ Скачать Excel файл",
-                data=excel_data,
-                file_name=f"spimex_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
-            )
+        st.download_button(
+            label="📊 Скачать Excel файл",
+            data=lambda: export_to_excel(filter_key),
+            file_name=f"spimex_data_{file_stamp}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            on_click='ignore',
+            use_container_width=True
+        )
 
     with col2:
-        if st.button("📄 Экспорт в CSV", use_container_width=True):
-            csv_data = export_to_csv(filtered_df)
-            st.download_button(
-                label="⬇️ Скачать CSV файл",
-                data=csv_data,
-                file_name=f"spimex_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-                use_container_width=True
-            )
+        st.download_button(
+            label="📄 Скачать CSV файл",
+            data=lambda: export_to_csv(filter_key),
+            file_name=f"spimex_data_{file_stamp}.csv",
+            mime="text/csv",
+            on_click='ignore',
+            use_container_width=True
+        )
+
+    with col3:
+        st.download_button(
+            label="🗜️ Скачать Parquet файл",
+            data=lambda: export_to_parquet(filter_key),
+            file_name=f"spimex_data_{file_stamp}.parquet",
+            mime="application/vnd.apache.parquet",
+            on_click='ignore',
+            use_container_width=True
+        )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    except QueryError as e:
+        st.error(str(e))
@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import requests, re, os
 from typing import Dict, List, Optional
 import openpyxl
@@ -6,27 +7,41 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.types import String, Integer, Float, Date, BigInteger
 from dotenv import load_dotenv
 
+from bulk_load import copy_dataframe, upsert_dataframe
+from rollups import refresh_rollups
+
+REPORT_URL = "https://spimex.com//files/trades/result/upload/reports/oil_xls/oil_xls_20251210162000.xls?r=8982&amp;p=L3VwbG9hZC9yZXBvcnRzL3BkZi9vaWwvb2lsXzIwMjUxMjEwMTYyMDAwLnBkZg.."
+
 # Шаг 1 - получение файла со страницы
 
-url = "https://spimex.com//files/trades/result/upload/reports/oil_xls/oil_xls_20251210162000.xls?r=8982&amp;p=L3VwbG9hZC9yZXBvcnRzL3BkZi9vaWwvb2lsXzIwMjUxMjEwMTYyMDAwLnBkZg.."
-response = requests.get(url)
-print(response.headers)
+def download_report(url, file_path='spimex_file_original.xls'):
+    response = requests.get(url)
+    print(response.headers)
 
-print("Заголовки ответа:")
-for key, value in response.headers.items():
-    if 'content' in key.lower():
-        print(f"  {key}: {value}")
+    print("Заголовки ответа:")
+    for key, value in response.headers.items():
+        if 'content' in key.lower():
+            print(f"  {key}: {value}")
 
-with open('spimex_file_original.xls', 'wb') as f:
-    f.write(response.content)
-print("✓ Файл сохранен как 'spimex_file_original.xls'")
+    with open(file_path, 'wb') as f:
+        f.write(response.content)
+    print(f"✓ Файл сохранен как '{file_path}'")
+    return file_path
 
 # 2 - Парсинг файла
 
-def simple_extract_data(file_path):
+def read_report(file_path):
+    return pd.read_excel(file_path, header=None, dtype=str)
 
-    df = pd.read_excel(file_path, header=None, dtype=str)
 
+def format_trade_date(value):
+    # "10.12.2025" -> "2025-12-10"
+    data_array = value.split(".")
+    return data_array[2] + "-" + data_array[1] + "-" + data_array[0]
+
+
+def extract_rows_loop(df):
+    # Исходный построчный разбор, оставлен как эталон для сравнения и бенчмарка
     data_rows = []
     data_column_value = ""
 
@@ -58,25 +73,52 @@ def simple_extract_data(file_path):
         else:
             i+=1
 
+    result_df = pd.DataFrame(data_rows, columns=df.columns)
+    result_df['Дата'] = format_trade_date(data_column_value)
+    return result_df
 
-    data_array = data_column_value.split(".")
-    data_column_value = data_array[2] + "-" + data_array[1] + "-" + data_array[0]
 
-    result_df = pd.DataFrame(data_rows, columns=df.columns)
-    result_df['Дата'] = data_column_value
-    print(f"Извлечено строк: {len(result_df)}")
+def extract_rows(df):
+    # Векторизованный разбор: строки таблиц находим масками по второй колонке
+    cells = df.iloc[:, 1].fillna("").astype(str)
+    positions = np.arange(len(df))
+
+    is_header = cells.str.replace(' ', '', regex=False).str.contains('Код\nИнструмента', regex=False).to_numpy()
+    # строка сразу после заголовка пропускается циклом без проверки
+    is_header = is_header & (~np.roll(is_header, 1) | (positions == 0))
+    skipped = is_header | np.roll(is_header, 1) & (positions > 0)
+
+    is_date = cells.str.contains("Дата торгов:", regex=False).to_numpy() & ~skipped
+    is_footer = cells.str.contains('Итого:', regex=False).to_numpy() & ~skipped & ~is_date
+
+    # позиция последнего заголовка таблицы для каждой строки
+    last_header = pd.Series(np.where(is_header, positions, np.nan)).ffill().to_numpy()
+    has_header = ~np.isnan(last_header)
+    table_start = np.where(has_header, last_header, 0).astype(np.int64) + 2
+
+    # таблица открыта, пока после заголовка не встретилось "Итого:"
+    footers_seen = np.cumsum(is_footer)
+    footers_before_start = np.concatenate(([0], footers_seen))[np.minimum(table_start, len(df))]
+    inside_data_table = has_header & (positions >= table_start) & (footers_seen == footers_before_start)
+
+    mask = inside_data_table & ~skipped & ~is_date & ~is_footer
+
+    date_cells = cells[is_date]
+    data_column_value = date_cells.iloc[-1].split(": ")[1] if len(date_cells) else ""
+
+    result_df = pd.DataFrame(df.to_numpy(dtype=object)[mask], columns=df.columns)
+    result_df['Дата'] = format_trade_date(data_column_value)
     return result_df
 
-data = simple_extract_data("spimex_file_original.xls")
-data.to_csv("simple_extracted.csv", index=False)
 
-pd.set_option('display.max_columns', None)
-pd.set_option('display.width', 1000)
-print(data.head(20))
+def simple_extract_data(file_path):
+    result_df = extract_rows(read_report(file_path))
+    print(f"Извлечено строк: {len(result_df)}")
+    return result_df
 
 # преобразуем полученные данные
-data = data.iloc[:, 1:]
-new_column_names = [
+
+NEW_COLUMN_NAMES = [
     'КодИнструмента',
     'НаименованиеИнструмента',
     'БазисПоставки',
@@ -94,13 +136,15 @@ new_column_names = [
     'Дата'
 ]
 
-data.columns = new_column_names
-data['Товар'] = data['НаименованиеИнструмента'].apply(
-        lambda x: x.split(',')[0] if ',' in x else x
-    )
-data = data.replace('-', None)
-print(data.head(20))
-data.to_csv("Parsed_data.csv", index=False)
+
+def transform_data(data):
+    data = data.iloc[:, 1:].copy()
+    data.columns = NEW_COLUMN_NAMES
+    data['Товар'] = data['НаименованиеИнструмента'].apply(
+            lambda x: x.split(',')[0] if ',' in x else x
+        )
+    data = data.replace('-', None)
+    return data
 
 # 3 - Теперь загрузим данные в PostgreSQL
 
@@ -117,38 +161,55 @@ DB_CONFIG = {
 DB_URL = (f"postgresql+psycopg2://{DB_CONFIG['user']}:{DB_CONFIG['password']}"
           f"@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}")
 
-def load_via_sqlalchemy(df, db_url, table_name='trade_data'):
+TRADE_DATA_DTYPES = {
+    'КодИнструмента': String(50),
+    'НаименованиеИнструмента': String(1000),
+    'БазисПоставки': String(500),
+    'ОбъемДоговоровЕИ': Integer(),
+    'ОбъемДоговоровРуб': BigInteger(),
+    'ИзмРынРуб': Float(),
+    'ИзмРынПроц': Float(),
+    'МинЦена': Float(),
+    'СреднЦена': Float(),
+    'МаксЦена': Float(),
+    'РынЦена': Float(),
+    'ЛучшПредложение': Integer(),
+    'ЛучшСпрос': Integer(),
+    'КоличествоДоговоров': Integer(),
+    'Дата': Date(),
+    'Товар': String(200)
+}
+
+
+TRADE_DATA_KEY = ['КодИнструмента', 'Дата']
+
+# индексы под фильтры дашборда; фильтр по инструменту покрывает уникальный индекс по ключу
+TRADE_DATA_INDEXES = {
+    'date_idx': ['Дата'],
+    'product_date_idx': ['Товар', 'Дата'],
+}
+
+
+def create_indexes(engine, table_name='trade_data'):
+    with engine.begin() as conn:
+        for suffix, columns in TRADE_DATA_INDEXES.items():
+            column_list = ", ".join(f'"{col}"' for col in columns)
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {table_name}_{suffix} ON {table_name} ({column_list})'))
 
+
+def load_via_copy(df, db_url, table_name='trade_data', chunk_rows=50_000, mode='upsert'):
+    # весь файл грузится одной транзакцией через COPY;
+    # в режиме upsert повторная загрузка дня не дублирует строки
     engine = create_engine(db_url)
-    dtype_mapping = {
-        'КодИнструмента': String(50),
-        'НаименованиеИнструмента': String(1000),
-        'БазисПоставки': String(500),
-        'ОбъемДоговоровЕИ': Integer(),
-        'ОбъемДоговоровРуб': BigInteger(),
-        'ИзмРынРуб': Float(),
-        'ИзмРынПроц': Float(),
-        'МинЦена': Float(),
-        'СреднЦена': Float(),
-        'МаксЦена': Float(),
-        'РынЦена': Float(),
-        'ЛучшПредложение': Integer(),
-        'ЛучшСпрос': Integer(),
-        'КоличествоДоговоров': Integer(),
-        'Дата': Date(),
-        'Товар': String(200)
-    }
 
     try:
-        df.to_sql(
-            table_name,
-            engine,
-            if_exists='append',
-            index=False,
-            dtype=dtype_mapping,
-            method='multi'
-        )
-
+        if mode == 'upsert':
+            upsert_dataframe(df, engine, table_name, TRADE_DATA_KEY,
+                             dtype=TRADE_DATA_DTYPES, chunk_rows=chunk_rows)
+        else:
+            copy_dataframe(df, engine, table_name, dtype=TRADE_DATA_DTYPES, chunk_rows=chunk_rows)
+        create_indexes(engine, table_name)
+        refresh_rollups(engine, df['Дата'].unique(), table_name)
         print(f"Успешно загружено {len(df)} записей в {table_name}")
         return True
 
@@ -156,4 +217,26 @@ def load_via_sqlalchemy(df, db_url, table_name='trade_data'):
         print(f"Ошибка при загрузке: {e}")
         return False
 
-load_via_sqlalchemy(data, DB_URL,"trade_data" )
\ No newline at end of file
+    finally:
+        engine.dispose()
+
+
+def main():
+    file_path = download_report(REPORT_URL)
+
+    data = simple_extract_data(file_path)
+    data.to_csv("simple_extracted.csv", index=False)
+
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.width', 1000)
+    print(data.head(20))
+
+    data = transform_data(data)
+    print(data.head(20))
+    data.to_csv("Parsed_data.csv", index=False)
+
+    load_via_copy(data, DB_URL, "trade_data")
+
+
+if __name__ == "__main__":
+    main()
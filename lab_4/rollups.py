@@ -0,0 +1,73 @@
+from sqlalchemy import text
+
+from bulk_load import bump_data_version
+
+# Предагрегаты trade_data по Дата x Товар x БазисПоставки для метрик дашборда.
+# После каждой загрузки пересчитываются только загруженные дни, поэтому
+# повторная загрузка дня (upsert) оставляет агрегаты корректными.
+
+ROLLUP_TABLE = 'trade_data_daily'
+ROLLUP_KEY = ['Дата', 'Товар', 'БазисПоставки']
+ROLLUP_MEASURES = {
+    'СреднЦена': 'double precision',
+    'ОбъемДоговоровРуб': 'numeric',
+    'КоличествоДоговоров': 'bigint',
+}
+
+
+def rollup_columns():
+    columns = {'Строк': 'bigint'}
+    for measure, sql_type in ROLLUP_MEASURES.items():
+        columns[f'{measure}Сумма'] = sql_type
+        columns[f'{measure}Кол'] = 'bigint'
+        columns[f'{measure}Мин'] = sql_type
+        columns[f'{measure}Макс'] = sql_type
+    return columns
+
+
+def rollup_select():
+    expressions = ['count(*)']
+    for measure in ROLLUP_MEASURES:
+        expressions += [f'sum("{measure}")', f'count("{measure}")', f'min("{measure}")', f'max("{measure}")']
+    return expressions
+
+
+def create_rollup_table(conn):
+    # возвращает True, если таблица только что создана и ее нужно заполнить целиком
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": ROLLUP_TABLE}).scalar():
+        return False
+
+    key_columns = ['"Дата" date', '"Товар" varchar(200)', '"БазисПоставки" varchar(500)']
+    value_columns = [f'"{name}" {sql_type}' for name, sql_type in rollup_columns().items()]
+    conn.execute(text(f'CREATE TABLE {ROLLUP_TABLE} ({", ".join(key_columns + value_columns)})'))
+    conn.execute(text(f'CREATE INDEX {ROLLUP_TABLE}_date_idx ON {ROLLUP_TABLE} ("Дата")'))
+    conn.execute(text(f'CREATE INDEX {ROLLUP_TABLE}_product_date_idx ON {ROLLUP_TABLE} ("Товар", "Дата")'))
+    return True
+
+
+def refresh_rollups(engine, dates=None, source_table='trade_data'):
+    keys = ", ".join(f'"{col}"' for col in ROLLUP_KEY)
+    columns = ", ".join(f'"{col}"' for col in rollup_columns())
+
+    with engine.begin() as conn:
+        if create_rollup_table(conn):
+            dates = None
+
+        if dates is None:
+            where, params = "", {}
+        else:
+            where, params = 'WHERE "Дата" = ANY(CAST(:dates AS date[]))', {"dates": [str(d) for d in dates]}
+
+        conn.execute(text(f'DELETE FROM {ROLLUP_TABLE} {where}'), params)
+        conn.execute(text(f"""
+            INSERT INTO {ROLLUP_TABLE} ({keys}, {columns})
+            SELECT {keys}, {", ".join(rollup_select())}
+            FROM {source_table}
+            {where}
+            GROUP BY {keys}
+        """), params)
+        # агрегаты обновляются отдельной транзакцией после загрузки - версия меняется еще раз,
+        # чтобы сводка, закэшированная между загрузкой и пересчетом, не осталась в кэше
+        bump_data_version(conn, source_table)
+
+    print(f"Агрегаты {ROLLUP_TABLE} обновлены" + (f" за {len(dates)} дн." if dates is not None else " полностью"))